@@ -9,6 +9,7 @@ filters fun to write. (`Installation <install.html>`_)
 from .containers import ListContainer, DictContainer
 
 from .base import Element, Block, Inline, MetaValue
+from .base import SKIP_CHILDREN, STOP_WALK
 
 # These elements are not part of pandoc-types
 from .elements import (
@@ -25,12 +26,13 @@ from .elements import (
 from .elements import (
     MetaList, MetaMap, MetaString, MetaBool, MetaInlines, MetaBlocks)
 
-from .io import load, dump, run_filter, run_filters
+from .io import load, load_blocks, dump, run_filter, run_filters
 from .io import toJSONFilter, toJSONFilters  # Wrappers
 from .io import load_reader_options
 
 from .tools import (
-    stringify, yaml_filter, shell, run_pandoc, convert_text, debug, get_option)
+    stringify, yaml_filter, shell, run_pandoc, convert_text,
+    convert_text_many, debug, get_option)
 
 from .autofilter import main, panfl, get_filter_dirs, stdio
 
@@ -51,7 +51,8 @@ def get_filter_dirs(hardcoded=True):
         return data_dir
 
 
-def stdio(filters=None, search_dirs=None, data_dir=True, sys_path=True, panfl_=False, input_stream=None, output_stream=None):
+def stdio(filters=None, search_dirs=None, data_dir=True, sys_path=True,
+          panfl_=False, input_stream=None, output_stream=None, lazy=False):
     """
     Reads JSON from stdin and second CLI argument:
     ``sys.argv[1]``. Dumps JSON doc to the stdout.
@@ -67,10 +68,12 @@ def stdio(filters=None, search_dirs=None, data_dir=True, sys_path=True, panfl_=F
         for debug purpose
     :param output_stream: io.StringIO or None
         for debug purpose
+    :param lazy: bool
+        load the document with ``lazy=True`` (see :func:`.load`)
     :return: None
     """
 
-    doc = load(input_stream)
+    doc = load(input_stream, lazy=lazy)
     verbose = doc.get_metadata('panflute-verbose', False)
 
     if search_dirs is None:
@@ -173,7 +176,10 @@ Search preserves directories order (except for --data-dir and
 @click.option('--no-sys-path', 'sys_path', is_flag=True, default=True,
               help="Disable search filters in python's `sys.path` (without '' and '.') " +
                    "that is appended to the search list.")
-def panfl(filters, to, search_dirs, data_dir, sys_path):
+@click.option('--lazy', is_flag=True, default=False,
+              help="Only decode the blocks that the filters access " +
+                   "(see the `lazy` argument of `panflute.load`).")
+def panfl(filters, to, search_dirs, data_dir, sys_path, lazy):
     """
     Allows Panflute to be run as a command line executable:
 
@@ -202,7 +208,7 @@ def panfl(filters, to, search_dirs, data_dir, sys_path):
         sys.argv[1:] = []
         sys.argv.append(to)
 
-    stdio(filters, search_dirs, data_dir, sys_path, panfl_=True)
+    stdio(filters, search_dirs, data_dir, sys_path, panfl_=True, lazy=lazy)
 
 
 def autorun_filters(filters, doc, search_dirs, verbose):
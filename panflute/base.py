@@ -6,12 +6,15 @@ Base classes and methods of all Pandoc elements
 # Imports
 # ---------------------------
 
-from operator import attrgetter
+import re
+import copy
+from operator import attrgetter, is_
+from functools import lru_cache
 from collections import OrderedDict
 from collections.abc import MutableSequence, MutableMapping
-from itertools import chain
 
-from .containers import ListContainer, DictContainer
+from .containers import ListContainer, DictContainer, TrackedList, TrackedDict
+from .containers import attach, RawJSON
 from .utils import check_type, encode_dict  # check_group
 
 
@@ -24,16 +27,104 @@ class Element(object):
     """
     Base class of all Pandoc elements
     """
-    __slots__ = ['parent', 'location']
+    __slots__ = ['parent', 'location', '_cache', '_root']
     _children = []
+    _index = None  # Only documents have one (see Doc.find_all)
 
     def __new__(cls, *args, **kwargs):
         # This is just to initialize self.parent to None
+        # (bypassing __setattr__, as there is nothing to invalidate yet)
         element = object.__new__(cls)
-        element.parent = None
-        element.location = None
+        _set_parent(element, None)
+        _set_location(element, None)
+        _set_cache(element, None)
+        _set_root(element, None)
         return element
 
+    def __setattr__(self, name, value):
+        if self.parent is None and self._cache is None and \
+                self._root is None and self._index is None:
+            # Not in a tree, nothing cached and no index to update
+            # (e.g. while the element is being built)
+            object.__setattr__(self, name, value)
+            return
+
+        if name in UNTRACKED_ATTRIBUTES:
+            object.__setattr__(self, name, value)
+            if name == 'parent':
+                self._forget_root()
+            return
+
+        # Slots such as ._content hold the children
+        if name == 'identifier' or \
+                (name[0] == '_' and name[1:] in self._children):
+            index = self._root_index()
+        else:
+            index = None
+
+        if index is None:
+            object.__setattr__(self, name, value)
+        elif name == 'identifier':
+            old = getattr(self, name, '')
+            object.__setattr__(self, name, value)
+            index.rename(self, old, value)
+        else:
+            old = getattr(self, name, None)
+            object.__setattr__(self, name, value)
+            self._reindex(_child_items(old), _child_items(value))
+        self._invalidate()
+
+    def __deepcopy__(self, memo):
+        # The copy belongs to the copy of the parent (if it is being
+        # copied too), and its children are copies that belong to it
+        ans = Element.__new__(type(self))
+        memo[id(self)] = ans
+        parent = memo.get(id(self.parent))
+        if parent is not None:
+            _set_parent(ans, parent)
+            _set_location(ans, self.location)
+        for name in _copied_slots(type(self)):
+            value = getattr(self, name, _missing)
+            if value is not _missing:
+                object.__setattr__(ans, name, copy.deepcopy(value, memo))
+        if self._cache is not None:
+            _set_cache(ans, dict(self._cache))  # Same contents, same data
+        for name, value in getattr(self, '__dict__', {}).items():
+            if name != '_index':
+                object.__setattr__(ans, name, copy.deepcopy(value, memo))
+        return ans
+
+    def _invalidate(self):
+        """
+        Discard the data cached in the element and its ancestors
+        (such as the JSON text it was decoded from); called whenever the
+        element or its containers are modified
+        """
+        elem = self
+        while elem is not None:
+            _set_cache(elem, None)
+            elem = elem.parent
+
+    def _reindex(self, removed, added):
+        """
+        Update the index of the document (if it has one) after the
+        children of the element were changed: *removed* and *added* are
+        the items that left or entered its containers
+        """
+        index = self._root_index()
+        if index is not None:
+            for item in removed:
+                index.remove(item)
+            for item in added:
+                index.add(item)
+
+    def _root_index(self):
+        """Return the index of the root document (if it has one)"""
+        if self.parent is None:
+            return self._index
+        doc = self.doc  # Cached, so this doesn't climb the tree every time
+        return None if doc is None else doc._index
+
     @property
     def tag(self):
         tag = type(self).__name__
@@ -82,8 +173,8 @@ class Element(object):
 
     def _set_ica(self, identifier, classes, attributes):
         self.identifier = check_type(identifier, str)
-        self.classes = [check_type(cl, str) for cl in classes]
-        self.attributes = OrderedDict(attributes)
+        self.classes = TrackedList((check_type(cl, str) for cl in classes), self)
+        self.attributes = TrackedDict(attributes, self)
 
     def _ica_to_json(self):
         return [self.identifier, self.classes, list(self.attributes.items())]
@@ -132,7 +223,9 @@ class Element(object):
         :rtype: ``int`` | ``None``
         """
         container = self.container
-        if container is not None:
+        if isinstance(container, ListContainer):
+            return container.position(self)
+        elif container is not None:
             return container.index(self)
 
     @property
@@ -214,12 +307,43 @@ class Element(object):
         """
         Return the root Doc element (if there is one)
         """
+        # The root found is cached in the element and its ancestors (as
+        # a 1-tuple, as it can be None), until one of them is moved
+        root = self._root
+        if root is not None:
+            return root[0]
+
+        path = []
         guess = self
-        while guess is not None and guess.tag != 'Doc':
+        while guess is not None:
+            root = guess._root
+            if root is not None:
+                guess = root[0]
+                break
+            elif type(guess).__name__ == 'Doc':
+                break
+            path.append(guess)
             guess = guess.parent  # If no parent, this will be None
+
+        root = (guess,)
+        for elem in path:
+            _set_root(elem, root)
         return guess  # Returns either Doc or None
 
-    def walk(self, action, doc=None):
+    def _forget_root(self):
+        """
+        Discard the root cached by .doc in the element and its descendants,
+        after it was moved; as roots are cached along the path to the root,
+        the descendants of an element without one have none either
+        """
+        stack = [self]
+        while stack:
+            elem = stack.pop()
+            if elem._root is not None:
+                _set_root(elem, None)
+                stack.extend(_iter_children(elem, _skip_all))
+
+    def walk(self, action, doc=None, topdown=False):
         """
         Walk through the element and all its children (sub-elements),
         applying the provided function ``action``.
@@ -237,13 +361,49 @@ class Element(object):
             altered = doc.walk(no_action)
 
 
-        :param action: function that takes (element, doc) as arguments.
-        :type action: :class:`function`
+        To only apply functions to some types of elements, pass a dict
+        that maps element classes to functions instead of ``action``;
+        each element goes to the function of its most specific class
+        (if any). Then subtrees that cannot contain any of these types
+        are skipped, and so are the undecoded blocks of lazily loaded
+        documents (see :func:`.load`) that don't contain them:
+
+        .. code-block:: python
+
+            doc.walk({CodeBlock: highlight, Header: add_anchor})
+
+        By default, the action is applied to the children of an element
+        before the element itself. With ``topdown=True``, it is applied
+        to the element first; if it returns a replacement (or a list),
+        the children of the replacement are walked instead. In top-down
+        walks, the action can also return :data:`SKIP_CHILDREN` to keep
+        the element and not walk its children.
+
+        In both cases, returning :data:`STOP_WALK` keeps the element and
+        ends the walk right away (the other changes are kept):
+
+        .. code-block:: python
+
+            def find_intro(elem, doc):
+                if isinstance(elem, Div) and 'no-process' in elem.classes:
+                    return SKIP_CHILDREN
+                elif isinstance(elem, Header) and elem.identifier == 'intro':
+                    doc.intro = elem
+                    return STOP_WALK
+
+            doc.walk(find_intro, topdown=True)
+
+        :param action: function that takes (element, doc) as arguments,
+            or dict of such functions keyed by element class.
+        :type action: :class:`function` | :class:`dict`
         :param doc: root document; used to access metadata,
             the output format (in ``.format``, other elements, and
             other variables). Only use this variable if for some reason
             you don't want to use the current document of an element.
         :type doc: :class:`.Doc`
+        :param topdown: apply the action to each element before its
+            children (default is False)
+        :type topdown: :class:`bool`
         :rtype: :class:`Element` | ``[]`` | ``None``
         """
 
@@ -251,30 +411,584 @@ class Element(object):
         if doc is None:
             doc = self.doc
 
-        # First iterate over children
-        for child in self._children:
-            obj = getattr(self, child)
-            if isinstance(obj, Element):
-                ans = obj.walk(action, doc)
-            elif isinstance(obj, ListContainer):
-                ans = (item.walk(action, doc) for item in obj)
-                # We need to convert single elements to iterables, so that they
-                # can be flattened later
-                ans = ((item,) if type(item) != list else item for item in ans)
-                # Flatten the list, by expanding any sublists
-                ans = list(chain.from_iterable(ans))
-            elif isinstance(obj, DictContainer):
-                ans = [(k, v.walk(action, doc)) for k, v in obj.items()]
-                ans = [(k, v) for k, v in ans if v != []]
-            elif obj is None:
-                ans = None  # Empty table headers or captions
+        return _walk(self, action, doc, topdown)
+
+    def iter(self, types=None):
+        """
+        Iterate over the element and all its descendants, in the order
+        they appear in the document (each element before its children).
+
+        Unlike :meth:`walk`, this only reads the tree, so it is faster;
+        the tree should not be modified while iterating. As with dicts of
+        actions, subtrees that cannot contain the requested types are
+        skipped.
+
+        .. code-block:: python
+
+            headers = [h for h in doc.iter(Header) if h.level == 1]
+
+        :param types: only return elements of this class
+            (or tuple of classes)
+        :type types: :class:`type` | :class:`tuple`
+        :rtype: iterator of :class:`Element`
+        """
+        if types is None:
+            plan = None
+            skip_raw = None
+        else:
+            if not isinstance(types, tuple):
+                types = (types,)
+            plan = _get_type_plan(frozenset((cls, True) for cls in types))
+            skip_raw = plan.skip_raw
+
+        stack = [iter((self,))]
+        while stack:
+            elem = next(stack[-1], None)
+            if elem is None:
+                stack.pop()
+                continue
+            if plan is None:
+                yield elem
+                descend = bool(elem._children)
             else:
-                raise TypeError(type(obj))
-            setattr(self, child, ans)
+                match, descend = plan[type(elem)]
+                if match:
+                    yield elem
+            if descend:
+                stack.append(_iter_children(elem, skip_raw))
+
+
+class _Sentinel(object):
+    __slots__ = ['name']
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+
+#: Return value of an action that skips the children of the element
+#: (only in top-down walks)
+SKIP_CHILDREN = _Sentinel('SKIP_CHILDREN')
+
+#: Return value of an action that ends the walk
+STOP_WALK = _Sentinel('STOP_WALK')
+
+
+def _walk(root, action, doc, topdown=False):
+    """
+    Walk the tree with an explicit stack (instead of recursion, which
+    would fail on deeply nested documents)
+
+    The stack holds the generators that walk the children of each
+    element; when the walk is stopped, they are sent STOP_WALK instead
+    of the result of each remaining child, so they return right away
+    """
+    plan = _WalkPlan(action)
+    skip_raw = plan.skip_raw
+    stopped = False
+
+    if topdown:
+        stack = []
+        elem = root
+    else:
+        stack = [_walk_children(root, plan[type(root)][0], doc, skip_raw)]
+        altered = None
+
+    while True:
+        if topdown:
+            # If the children must be walked, this pushes their
+            # generator and returns None, to start it
+            altered = _visit(elem, plan, doc, skip_raw, stack)
+            if altered is STOP_WALK:
+                stopped = True
+
+        # Resume the generator at the top of the stack
+        while True:
+            if not stack:
+                return root if altered is STOP_WALK else altered
+            try:
+                elem = stack[-1].send(altered)
+            except StopIteration as stop:
+                # All the children were visited (and the action applied)
+                stack.pop()
+                altered = stop.value
+                if altered is STOP_WALK:
+                    stopped = True
+                elif stopped and not topdown:
+                    # Unchanged, as actions are no longer applied
+                    altered = STOP_WALK
+                continue
+
+            if stopped:
+                altered = STOP_WALK
+            elif topdown:
+                break
+            else:
+                action, descend = plan[type(elem)]
+                if descend:
+                    stack.append(_walk_children(elem, action, doc, skip_raw))
+                    altered = None
+                else:
+                    # Shortcut for elements without children (Str, Space)
+                    # or without anything to do inside
+                    altered = None if action is None else action(elem, doc)
+                    if altered is None:
+                        altered = elem
+                    elif altered is STOP_WALK:
+                        stopped = True
+
+
+def _visit(elem, plan, doc, skip_raw, stack):
+    """
+    Apply the action of a top-down walk to an element; if its children
+    (or those of its replacement) must be walked, push their generator
+    on the stack and return None, else return the result to send back
+    """
+    action, descend = plan[type(elem)]
+    altered = None if action is None else action(elem, doc)
+    if altered is None:
+        altered = elem
+    elif altered is SKIP_CHILDREN:
+        return elem
+    elif altered is STOP_WALK:
+        return altered
+    elif type(altered) == list:
+        stack.append(_walk_items(altered, doc, skip_raw))
+        return None
+    else:
+        descend = plan[type(altered)][1]
+    if not descend:
+        return altered
+    stack.append(_walk_children(altered, None, doc, skip_raw))
+    return None
+
+
+def _walk_items(items, doc, skip_raw):
+    """Walk the children of a list of elements returned by an action"""
+    for item in items:
+        if isinstance(item, Element):
+            yield from _walk_children(item, None, doc, skip_raw)
+    return items
+
+
+def _walk_children(elem, action, doc, skip_raw=None):
+    """
+    Yield the children of an element and receive what their walk
+    returned; then apply the action to the element and return its result
+    """
+    for child in elem._children:
+        obj = getattr(elem, child)
+        if isinstance(obj, Element):
+            _reattach(obj, elem, child)
+            ans = yield obj
+            if ans is not obj:
+                if ans is STOP_WALK:
+                    return elem
+                setattr(elem, child, ans)
+        elif isinstance(obj, ListContainer):
+            seen, changes = [], []
+            items = obj if skip_raw is None else _iter_items(obj, skip_raw)
+            for item in items:
+                seen.append(item)
+                if type(item) is RawJSON:
+                    continue  # Nothing to do inside, so it was not decoded
+                _reattach(item, elem, obj.location)
+                altered = yield item
+                if altered is not item:
+                    if altered is STOP_WALK:
+                        seen.extend(obj.list[len(seen):])
+                        _update_list(elem, child, obj, seen, changes)
+                        return elem
+                    # Lists are spliced into the container ([] deletes)
+                    if type(altered) != list:
+                        altered = [altered]
+                    changes.append((len(seen) - 1, altered))
+            _update_list(elem, child, obj, seen, changes)
+        elif isinstance(obj, DictContainer):
+            changes = []
+            stopped = False
+            for k, v in obj.dict.items():
+                if type(v) is RawJSON:
+                    if skip_raw is not None and skip_raw(v.text):
+                        continue  # As in ListContainers
+                    v = obj[k]  # Only replaces the value of k
+                _reattach(v, elem, None)
+                altered = yield v
+                if altered is STOP_WALK:
+                    stopped = True
+                    break
+                elif altered is not v:
+                    changes.append((k, altered))
+            for k, altered in changes:
+                if altered == []:
+                    del obj[k]
+                else:
+                    obj[k] = altered
+            if stopped:
+                return elem
+        elif obj is not None:  # None for empty table headers
+            raise TypeError(type(obj))
+
+    # Then apply the action to the element
+    altered = None if action is None else action(elem, doc)
+    return elem if altered is None else altered
+
+
+def _reattach(item, parent, location):
+    """
+    Containers set the parent of the elements they receive; fix it for
+    those that were then also added somewhere else (such as the items
+    of header.content after Plain(*header.content))
+    """
+    if item.parent is not parent:
+        attach(item, parent, location)
+
+
+def _iter_children(elem, skip_raw):
+    """
+    Yield the children of an element, without decoding the RawJSON
+    items for which skip_raw(text) is True
+    """
+    for child in elem._children:
+        obj = getattr(elem, child)
+        if isinstance(obj, Element):
+            yield obj
+        elif isinstance(obj, ListContainer):
+            if skip_raw is None:
+                yield from obj
+            else:
+                for item in _iter_items(obj, skip_raw):
+                    if type(item) is not RawJSON:
+                        yield item
+        elif isinstance(obj, DictContainer):
+            if skip_raw is None:
+                yield from obj.values()
+            else:
+                for k, v in obj.dict.items():
+                    if type(v) is not RawJSON:
+                        yield v
+                    elif not skip_raw(v.text):
+                        yield obj[k]
+
+
+def _iter_items(container, skip_raw):
+    """
+    Same as iter(container), except that RawJSON items are not decoded
+    if skip_raw(text) is True
+    """
+    i = 0
+    while i < len(container.list):
+        item = container.list[i]
+        if type(item) is not RawJSON or not skip_raw(item.text):
+            item = container[i]
+        yield item
+        i += 1
+
+
+class _WalkPlan(dict):
+    """
+    Map each element class to (action, descend): the function to apply
+    to its elements (or None), and whether to walk their children
+
+    If *action* is a dict of functions keyed by element class, also
+    provide skip_raw(), which tells if the JSON text of an undecoded
+    element can't contain any of these classes
+    """
+
+    def __init__(self, action):
+        self.action = action
+        if isinstance(action, dict):
+            self.types = _get_type_plan(frozenset(
+                (cls, f is not None) for cls, f in action.items()))
+            self.skip_raw = self.types.skip_raw
+        else:
+            self.types = None
+            self.skip_raw = None
+
+    def __missing__(self, cls):
+        if self.types is None:
+            ans = self.action, bool(cls._children)
+        else:
+            match, descend = self.types[cls]
+            ans = _lookup(self.action, cls) if match else None, descend
+        self[cls] = ans
+        return ans
+
+
+class _TypePlan(dict):
+    """
+    Map each element class to (match, descend): whether its elements go
+    to a function of a dict of actions, and whether to walk their children
+
+    This only depends on the classes that have a function, so unlike
+    _WalkPlan it is shared by the walks with the same classes. It also
+    provides skip_raw() (see _WalkPlan).
+
+    :param matches: pairs of (class, whether it has a function)
+    """
+
+    def __init__(self, matches):
+        from .elements import CHILD_TYPES, _DECODERS
+        self.matches = dict(matches)
+        self.child_types = CHILD_TYPES
+        targets = [cls for cls in _subclasses(Element) if self.match(cls)]
+
+        # Tags that appear in the JSON of any target: elements such as
+        # ListItem or Citation have none, so use the ones of
+        # the elements that contain them
+        tags = set()
+        seen = set(targets)
+        while targets:
+            cls = targets.pop()
+            if cls.__name__ in _DECODERS:
+                tags.add(cls.__name__)
+                continue
+            for parent, oktypes in CHILD_TYPES.items():
+                if issubclass(cls, oktypes) and parent not in seen:
+                    seen.add(parent)
+                    targets.append(parent)
+        tags = '|'.join(sorted(tags))
+        pattern = re.compile('"(?:{})"'.format(tags))
+        self.skip_raw = lambda text: pattern.search(text) is None
+
+    def match(self, cls):
+        return bool(_lookup(self.matches, cls))
+
+    def __missing__(self, cls):
+        below = _types_below(cls, self.child_types)
+        descend = bool(cls._children) and \
+            (below is None or any(self.match(x) for x in below))
+        ans = self[cls] = self.match(cls), descend
+        return ans
+
+
+@lru_cache(maxsize=32)
+def _get_type_plan(matches):
+    # Plans take a while to build, so reuse them; they only hold classes,
+    # so the cache doesn't keep the actions (or their closures) alive
+    return _TypePlan(matches)
+
+
+def _lookup(mapping, cls):
+    """Return the value of the most specific class of cls in the mapping"""
+    for base in cls.__mro__:
+        if base in mapping:
+            return mapping[base]
+
+
+@lru_cache(maxsize=None)
+def _copied_slots(cls):
+    """Slots of the class that are copied by copy.deepcopy()"""
+    names = set()
+    for base in cls.__mro__:
+        names.update(getattr(base, '__slots__', ()))
+    return tuple(sorted(names - {'parent', 'location', '_cache', '_root'}))
+
+
+def _subclasses(cls):
+    ans = {cls}
+    for sub in cls.__subclasses__():
+        ans |= _subclasses(sub)
+    return ans
+
+
+def _types_below(cls, child_types):
+    """
+    Return the set of element classes that can appear inside an element
+    of the given class (or None if unknown)
+
+    :param child_types: maps each element class to the types allowed in
+        its children (see CHILD_TYPES in elements.py)
+    """
+    ans = set()
+    todo = [cls]
+    while todo:
+        cls = todo.pop()
+        if not cls._children:
+            continue
+        if cls not in child_types:
+            return None
+        for oktype in child_types[cls]:
+            for sub in _subclasses(oktype):
+                if sub not in ans:
+                    ans.add(sub)
+                    todo.append(sub)
+    return ans
+
+
+def _update_list(elem, child, container, seen, changes):
+    """
+    Apply the changes made while walking the items of a ListContainer;
+    *seen* are the items visited and *changes* the (position, new items)
+    pairs of those that were replaced or deleted
+    """
+    items = container.list
+    untouched = getattr(elem, child) is container and \
+        len(items) == len(seen) and all(map(is_, items, seen))
+
+    if untouched and len(changes) <= MAX_SPLICES:
+        # Splice from the end, so the positions remain valid
+        for i, new in reversed(changes):
+            items[i:i + 1] = container._adopt(new)
+        if changes:
+            container._moved(changes[0][0])
+            elem._invalidate()
+            _reindex_changes(elem, seen, changes)
+        return
+
+    ans = []
+    start = 0
+    for i, new in changes:
+        ans.extend(seen[start:i])
+        ans.extend(container._adopt(new))
+        start = i + 1
+    ans.extend(seen[start:])
+
+    if untouched:
+        items[:] = ans
+        container._moved(0)
+        elem._invalidate()
+        _reindex_changes(elem, seen, changes)
+    else:
+        # The actions modified the container themselves; as in a
+        # recursive walk, the result is the list of walked items
+        setattr(elem, child, ans)
+
+
+def _reindex_changes(elem, seen, changes):
+    if elem._root_index() is not None:
+        elem._reindex([seen[i] for i, new in changes],
+                      [x for i, new in changes for x in new])
+
+
+def _child_items(obj):
+    """Return the items of a child attribute (container or element)"""
+    if isinstance(obj, ListContainer):
+        return list(obj.list)
+    elif isinstance(obj, DictContainer):
+        return list(obj.dict.values())
+    elif isinstance(obj, Element):
+        return [obj]
+    else:
+        return []
+
+
+class _ElementIndex(object):
+    """
+    Index of the elements of a document by class (see
+    :meth:`.Doc.find_all`); for each class, a dict keyed by id keeps
+    the elements in the order they were added.
+
+    Elements are counted, as they can be briefly referenced twice while
+    being moved (e.g. when swapping two items of a container).
+
+    The elements with an identifier are also kept in *by_id*, as dicts
+    keyed by id (duplicate identifiers have more than one element)
+    """
 
-        # Then apply the action to the element
-        altered = action(self, doc)
-        return self if altered is None else altered
+    def __init__(self, doc):
+        self.by_type = {}
+        self.by_id = {}
+        self.counts = {}
+        for elem in doc.iter():  # Decodes the lazily loaded blocks
+            self._add(elem)
+
+    def _add(self, elem):
+        key = id(elem)
+        count = self.counts.get(key, 0)
+        self.counts[key] = count + 1
+        if not count:
+            items = self.by_type.get(type(elem))
+            if items is None:
+                items = self.by_type[type(elem)] = {}
+            items[key] = elem
+            identifier = getattr(elem, 'identifier', '')
+            if identifier:
+                self.by_id.setdefault(identifier, {})[key] = elem
+
+    def add(self, item):
+        """Add an element and its descendants"""
+        if isinstance(item, Element):
+            for elem in _iter_decoded(item):
+                self._add(elem)
+
+    def remove(self, item):
+        """Remove an element and its descendants"""
+        if isinstance(item, Element):
+            for elem in _iter_decoded(item):
+                key = id(elem)
+                count = self.counts.pop(key, 0)
+                if count > 1:
+                    self.counts[key] = count - 1
+                elif count:
+                    del self.by_type[type(elem)][key]
+                    self._unname(elem, getattr(elem, 'identifier', ''))
+
+    def _unname(self, elem, identifier):
+        items = self.by_id.get(identifier)
+        if items is not None:
+            items.pop(id(elem), None)
+            if not items:
+                del self.by_id[identifier]
+
+    def rename(self, elem, old, new):
+        """Update the identifier of an indexed element"""
+        if id(elem) in self.counts:
+            self._unname(elem, old)
+            if new:
+                self.by_id.setdefault(new, {})[id(elem)] = elem
+
+    def find_all(self, cls):
+        ans = []
+        for sub, items in self.by_type.items():
+            if issubclass(sub, cls):
+                ans.extend(items.values())
+        return ans
+
+    def find_by_id(self, identifier):
+        items = self.by_id.get(identifier)
+        if items:
+            return next(iter(items.values()))
+
+    def duplicate_ids(self):
+        return {identifier: list(items.values())
+                for identifier, items in self.by_id.items()
+                if len(items) > 1}
+
+
+def _iter_decoded(root):
+    """Same as root.iter(), but skipping the undecoded items"""
+    stack = [iter((root,))]
+    while stack:
+        elem = next(stack[-1], None)
+        if elem is None:
+            stack.pop()
+            continue
+        yield elem
+        if elem._children:
+            stack.append(_iter_children(elem, _skip_all))
+
+
+def _skip_all(text):
+    return True
+
+
+_missing = object()
+
+# Above this, rebuild the list instead of splicing one item at a time
+MAX_SPLICES = 16
+
+# Attributes that can change without altering the element
+UNTRACKED_ATTRIBUTES = frozenset(['parent', 'location', '_cache', '_root',
+                                  '_index'])
+
+# Setters of these attributes that skip Element.__setattr__
+_set_parent = Element.parent.__set__
+_set_location = Element.location.__set__
+_set_cache = Element._cache.__set__
+_set_root = Element._root.__set__
 
 
 class Inline(Element):
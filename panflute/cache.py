@@ -0,0 +1,189 @@
+"""
+Cache for the results of :func:`.convert_text`
+
+Filters often convert the same snippets (disclaimers, author bios,
+shared includes) on every run and for every document. Once a cache is
+set, the Pandoc output for each input is kept in memory and optionally
+on disk, so only new inputs call Pandoc:
+
+    >>> from panflute.cache import ConversionCache, set_cache
+    >>> set_cache(ConversionCache(path='.panflute-cache'))
+
+The key of each entry is a hash of the input text, the formats, the
+extra arguments and the Pandoc version (and whether the text was
+converted with other fragments, which share link and footnote
+definitions). Outputs are stored as text, so
+cached 'panflute' outputs are decoded into new elements every time.
+"""
+
+# ---------------------------
+# Imports
+# ---------------------------
+
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+# ---------------------------
+# Classes
+# ---------------------------
+
+class ConversionCache(object):
+    """
+    Least recently used cache of Pandoc outputs.
+
+    :param maxsize: number of outputs kept in memory
+    :type maxsize: :class:`int`
+    :param path: folder where the outputs are also stored, so they can be
+        reused by other processes and later runs (``None`` to keep them
+        only in memory)
+    :type path: :class:`str` | ``None``
+    :param max_disk_size: size in bytes of the files kept in the folder;
+        beyond that, the least recently used ones are deleted
+    :type max_disk_size: :class:`int`
+    """
+
+    def __init__(self, maxsize=256, path=None, max_disk_size=100 * 2 ** 20):
+        self.maxsize = maxsize
+        self.path = path
+        self.max_disk_size = max_disk_size
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.disk_size = None  # Computed on first write
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def key(text, input_format, output_format, extra_args, version,
+            batched=False):
+        """
+        Return the key of a conversion (``batched`` for fragments converted
+        together by :func:`.convert_text_many`, which can differ from the
+        output of the same fragment converted on its own)
+        """
+        data = [text, input_format, output_format, list(extra_args), version]
+        if batched:
+            data.append('batched')
+        data = json.dumps(data)
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Return the output stored with the key, or ``None``"""
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                return self.memory[key]
+
+        if self.path is None:
+            return None
+        fn = os.path.join(self.path, key)
+        try:
+            with open(fn, encoding='utf-8') as f:
+                value = f.read()
+            os.utime(fn)  # Now the most recently used
+        except OSError:
+            return None
+        self._remember(key, value)
+        return value
+
+    def set(self, key, value):
+        """Store the output of a conversion"""
+        self._remember(key, value)
+        if self.path is None:
+            return
+
+        # Write to a temporary file first, so other processes never
+        # read incomplete entries
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        with open(fd, 'w', encoding='utf-8') as f:
+            f.write(value)
+        size = os.path.getsize(tmp)
+        fn = os.path.join(self.path, key)
+        try:
+            size -= os.path.getsize(fn)  # Replaced, so not counted twice
+        except OSError:
+            pass
+        os.replace(tmp, fn)
+
+        with self.lock:
+            if self.disk_size is None:
+                self.disk_size = sum(size for fn, size, mtime in self._files())
+            else:
+                self.disk_size += size
+            if self.disk_size > self.max_disk_size:
+                self._evict()
+
+    def clear(self):
+        """Remove all the entries, in memory and on disk"""
+        with self.lock:
+            self.memory.clear()
+            if self.path is not None:
+                for fn, size, mtime in self._files():
+                    os.remove(fn)
+                self.disk_size = 0
+
+    def _remember(self, key, value):
+        with self.lock:
+            self.memory[key] = value
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.maxsize:
+                self.memory.popitem(last=False)
+
+    def _files(self):
+        ans = []
+        for entry in os.scandir(self.path):
+            if entry.is_file() and not entry.name.endswith('.tmp'):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue  # Deleted by another process
+                ans.append((entry.path, stat.st_size, stat.st_mtime))
+        return ans
+
+    def _evict(self):
+        # Other processes may have written to the folder too
+        files = sorted(self._files(), key=lambda item: item[2])
+        self.disk_size = sum(size for fn, size, mtime in files)
+        for fn, size, mtime in files:
+            if self.disk_size <= self.max_disk_size:
+                break
+            try:
+                os.remove(fn)
+            except OSError:
+                continue
+            self.disk_size -= size
+
+
+# ---------------------------
+# Constants
+# ---------------------------
+
+_default_cache = None
+
+
+# ---------------------------
+# Functions
+# ---------------------------
+
+def get_cache():
+    """
+    Return the cache set with :func:`set_cache` (or ``None``)
+
+    :rtype: :class:`ConversionCache` | ``None``
+    """
+    return _default_cache
+
+
+def set_cache(cache):
+    """
+    Set the cache used by :func:`.convert_text` and
+    :func:`.convert_text_many` unless they are called with ``cache=False``.
+
+    :param cache: a :class:`ConversionCache`, or ``None`` to stop caching
+    """
+    global _default_cache
+    _default_cache = cache
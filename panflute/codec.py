@@ -0,0 +1,166 @@
+"""
+JSON backends used to read and write Pandoc documents
+
+The standard library is always available, but ``orjson`` and ``ujson``
+(if installed) serialize the documents several times faster.
+All backends produce exactly the same output as :func:`json.dumps` with
+compact separators and ``ensure_ascii=False``; in the rare cases where a
+faster backend would differ (e.g. floats in exponent notation),
+we fall back to the standard library.
+"""
+
+# ---------------------------
+# Imports
+# ---------------------------
+
+import re
+import json
+from collections import OrderedDict
+
+
+# ---------------------------
+# Backends
+# ---------------------------
+
+class JSONCodec(object):
+    """
+    Standard library backend (:mod:`json`).
+
+    Decoding always goes through this class: the ``object_pairs_hook``
+    of :mod:`json` builds the elements while the text is parsed, which
+    is faster than parsing with other libraries and then converting
+    their output in Python.
+    """
+
+    name = 'json'
+
+    def load(self, input_stream, object_pairs_hook):
+        return self.loads(input_stream.read(), object_pairs_hook)
+
+    def loads(self, text, object_pairs_hook):
+        return json.loads(text, object_pairs_hook=object_pairs_hook)
+
+    def dumps(self, obj):
+        return json.dumps(
+            obj=obj,
+            default=_serialize,  # Serializer
+            check_circular=False,
+            separators=(',', ':'),  # Compact separators, like Pandoc
+            ensure_ascii=False  # For Pandoc compat
+        )
+
+
+class OrjsonCodec(JSONCodec):
+    """
+    Backend based on `orjson <https://github.com/ijl/orjson>`_
+    """
+
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self.orjson = orjson
+
+    def dumps(self, obj):
+        try:
+            ans = self.orjson.dumps(obj, default=_serialize).decode('utf-8')
+        except (TypeError, ValueError, OverflowError):
+            # Integers above 64 bits, lone surrogates, etc.
+            return super().dumps(obj)
+        if UNSAFE_NUMBERS.search(ans):
+            return super().dumps(obj)
+        return ans
+
+
+class UjsonCodec(JSONCodec):
+    """
+    Backend based on `ujson <https://github.com/ultrajson/ultrajson>`_
+    """
+
+    name = 'ujson'
+
+    def __init__(self):
+        import ujson
+        self.ujson = ujson
+
+    def dumps(self, obj):
+        try:
+            ans = self.ujson.dumps(obj, default=_serialize,
+                                   ensure_ascii=False,
+                                   escape_forward_slashes=False)
+        except (TypeError, ValueError, OverflowError):
+            return super().dumps(obj)
+        if UNSAFE_NUMBERS.search(ans):
+            return super().dumps(obj)
+        return ans
+
+
+# ---------------------------
+# Constants
+# ---------------------------
+
+CODECS = OrderedDict([
+    ('orjson', OrjsonCodec),
+    ('ujson', UjsonCodec),
+    ('json', JSONCodec)])
+
+# Numbers that other backends might format differently than the stdlib:
+# exponents (1e-05 vs 1e-5), small decimals (1e-05 vs 0.00001),
+# and NaN/Infinity (written as null by orjson)
+# Matches inside strings are possible but only cause a harmless fallback
+UNSAFE_NUMBERS = re.compile(r'[\[,:](?:-?\d+(?:\.\d+)?[eE]|-?0\.0000|null)')
+
+# Output of all backends must match the stdlib on this sample
+_PROBE = [{'t': 'Str', 'c': 'a\x01\x1f "\\é\n/<>&\x7f'},
+          OrderedDict([('b', (1, 17, 0, 4)), ('a', [True, False])]),
+          [0.0, 0.5, 2.0, 0.13253012048192772, 123456.789, -7, '']]
+
+_default_codec = None
+
+
+# ---------------------------
+# Functions
+# ---------------------------
+
+def _serialize(elem):
+    return elem.to_json()
+
+
+def get_codec(name=None):
+    """
+    Return a JSON backend.
+
+    :param name: one of 'orjson', 'ujson' or 'json'. If ``None`` (the
+        default), return the backend set by :func:`set_codec`, or else the
+        fastest one that is installed.
+    :rtype: :class:`JSONCodec`
+    """
+    global _default_codec
+
+    if name is not None:
+        if name not in CODECS:
+            raise ValueError('unknown JSON backend: {}'.format(name))
+        return CODECS[name]()
+
+    if _default_codec is None:
+        for cls in CODECS.values():
+            try:
+                codec = cls()
+            except ImportError:
+                continue
+            if codec.dumps(_PROBE) == JSONCodec.dumps(codec, _PROBE):
+                _default_codec = codec
+                break
+
+    return _default_codec
+
+
+def set_codec(name=None):
+    """
+    Set the JSON backend used by :func:`.load` and :func:`.dump`
+    (``None`` restores the automatic choice).
+
+    :param name: one of 'orjson', 'ujson', 'json', or ``None``
+    """
+    global _default_codec
+    _default_codec = None if name is None else get_codec(name)
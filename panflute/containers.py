@@ -7,6 +7,8 @@ object, and the attribute of the parent object that they correspond to.
 # Imports
 # ---------------------------
 
+import copy
+import json
 from collections import OrderedDict
 from collections.abc import MutableSequence, MutableMapping
 from .utils import check_type, encode_dict  # check_group
@@ -18,7 +20,7 @@ from .utils import check_type, encode_dict  # check_group
 # These are list and OrderedDict containers that
 #  (a) track the identity of their parents, and
 #  (b) track the parent's property where they are stored
-# They attach these two to the elements requested through __getattr__
+# They attach these two to the elements when they enter the container
 
 class ListContainer(MutableSequence):
     """
@@ -31,21 +33,44 @@ class ListContainer(MutableSequence):
     :type oktypes: ``type`` | ``tuple``
     :param parent: the parent element
     :type parent: ``Element``
-    :param container: None, unless the element is not part of its .parent.content (this is the case for table headers for instance, which are not retrieved with table.content but with table.header)
-    :type container: ``str`` | None
+    :param location: None, unless the container is not the .content of its parent (this is the case for table captions for instance, which are retrieved with table.caption instead of table.content)
+    :type location: ``str`` | None
     """
     # Based on http://stackoverflow.com/a/3488283
     # See also https://docs.python.org/3/library/collections.abc.html
 
-    __slots__ = ['list', 'oktypes', 'parent', 'location']
+    __slots__ = ['list', 'oktypes', 'parent', 'location',
+                 '_positions', '_known']
 
-    def __init__(self, *args, oktypes=object, parent=None):
+    def __init__(self, *args, oktypes=object, parent=None, location=None):
         self.oktypes = oktypes
         self.parent = parent
-        self.location = None  # Cannot be set through __init__
-
-        self.list = []
-        self.extend(args)  # self.oktypes must be set first
+        self.location = location
+        self._positions = {}  # See position()
+        self._known = 0
+
+        self.list = self._adopt(args)
+
+    @classmethod
+    def _from_trusted(cls, items, oktypes, parent, location=None):
+        """
+        Wrap a list of items that are known to be valid (such as the
+        ones just decoded from Pandoc's output), without copying the list
+        or checking the type of each item.
+        """
+        obj = object.__new__(cls)
+        obj.oktypes = oktypes
+        obj.parent = parent
+        obj.location = location
+        obj.list = items
+        obj._positions = {}
+        obj._known = 0
+        set_attr = _set_attr
+        for item in items:
+            if type(item) is not RawJSON:
+                set_attr(item, 'parent', parent)
+                set_attr(item, 'location', location)
+        return obj
 
     def __contains__(self, item):
         return item in self.list
@@ -55,27 +80,135 @@ class ListContainer(MutableSequence):
 
     def __getitem__(self, i):
         if isinstance(i, int):
-            return attach(self.list[i], self.parent, self.location)
+            item = self.list[i]
+            if type(item) is RawJSON:
+                item = self._decode(i)
+            return item
         else:
+            for j in range(*i.indices(len(self.list))):
+                if type(self.list[j]) is RawJSON:
+                    self._decode(j)
             newlist = self.list.__getitem__(i)
-            obj = ListContainer(*newlist,
-                                oktypes=self.oktypes, parent=self.parent)
-            obj.location = self.location
-            return obj
+            return ListContainer(*newlist, oktypes=self.oktypes,
+                                 parent=self.parent, location=self.location)
+
+    def __iter__(self):
+        # Faster than the index-based default of MutableSequence
+        for i, item in enumerate(self.list):
+            if type(item) is RawJSON:
+                item = self._decode(i)
+            yield item
+
+    def _decode(self, i):
+        item = self.list[i] = self.list[i].decode()
+        attach(item, self.parent, self.location)
+        self._replaced(i, item)
+        return item
+
+    def _adopt(self, items):
+        """
+        Check the type of the items that enter the container, and attach
+        them to its parent
+        """
+        parent, location, oktypes = self.parent, self.location, self.oktypes
+        items = list(items)
+        for i, item in enumerate(items):
+            if type(item) is RawJSON:
+                continue  # Validated once decoded
+            if callable(item) or not isinstance(item, oktypes):
+                item = items[i] = check_type(item, oktypes)
+            if getattr(item, 'parent', _missing) is None and \
+                    item._root is None:
+                # New element, so nothing else knows about it (the
+                # common case, inlined as it runs for every item loaded)
+                _set_attr(item, 'parent', parent)
+                _set_attr(item, 'location', location)
+            else:
+                attach(item, parent, location)
+        return items
+
+    def _contains(self, item):
+        """Same as ``item in self``, but faster if the item is there"""
+        i = self._positions.get(id(item))
+        if i is not None and i < self._known and self.list[i] is item:
+            return True
+        return any(x is item for x in self.list)
+
+    def position(self, item):
+        """
+        Return the position of the item in the list, as ``.index(item)``
+        does, but in constant time (amortized).
+
+        The positions are stored as the list is scanned; inserting or
+        deleting an item only invalidates the positions after it, which
+        are scanned again when needed. Items that appear more than once
+        keep the position of their first occurrence.
+        """
+        positions = self._positions
+        i = positions.get(id(item))
+        if i is not None and i < self._known and self.list[i] is item:
+            return i
+        # Scan the items whose position is unknown; if the item is not
+        # there, the list was modified directly, so start over
+        for start in (self._known, 0):
+            for j in range(start, len(self.list)):
+                x = self.list[j]
+                i = positions.get(id(x))
+                if i is None or i >= j or self.list[i] is not x:
+                    positions[id(x)] = j
+                if x is item:
+                    self._known = j + 1
+                    return positions[id(x)]
+            positions = self._positions = {}
+            self._known = 0
+        raise ValueError('{} is not in the list'.format(item))
+
+    def _moved(self, i):
+        """Invalidate the positions from i onwards"""
+        if isinstance(i, slice):
+            start, stop, step = i.indices(len(self.list))
+            i = start if step > 0 else stop + 1
+        elif i < 0:
+            i += len(self.list)
+        if i < self._known:
+            self._known = max(i, 0)
+
+    def _replaced(self, i, item):
+        """Update the position of the item that was set at i"""
+        if i < 0:
+            i += len(self.list)
+        if i < self._known:
+            # Unless the item was already there before
+            j = self._positions.get(id(item))
+            if j is None or j >= i or self.list[j] is not item:
+                self._positions[id(item)] = i
 
     def __delitem__(self, i):
+        old = self.list[i]
+        self._moved(i)
         del self.list[i]
+        invalidate(self.parent)
+        reindex(self.parent, old if isinstance(i, slice) else [old], ())
 
     def __setitem__(self, i, v):
+        old = self.list[i]
         if isinstance(i, slice):
-            v = (check_type(x, self.oktypes) for x in v)
+            v = self._adopt(v)
+            self._moved(i)
         else:
-            v = check_type(v, self.oktypes)
+            old = [old]
+            v = self._adopt([v])[0]
+            self._replaced(i, v)
         self.list[i] = v
+        invalidate(self.parent)
+        reindex(self.parent, old, v if isinstance(i, slice) else [v])
 
     def insert(self, i, v):
-        v = check_type(v, self.oktypes)
+        v = self._adopt([v])[0]
+        self._moved(i)
         self.list.insert(i, v)
+        invalidate(self.parent)
+        reindex(self.parent, (), [v])
 
     def __str__(self):
         return self.__repr__()
@@ -83,6 +216,12 @@ class ListContainer(MutableSequence):
     def __repr__(self):
         return 'ListContainer({})'.format(' '.join(repr(x) for x in self.list))
 
+    def __deepcopy__(self, memo):
+        # The items of the copy belong to the copy of the parent
+        items = [copy.deepcopy(item, memo) for item in self.list]
+        return self._from_trusted(items, self.oktypes,
+                                  memo.get(id(self.parent)), self.location)
+
     def to_json(self):
         return [to_json_wrapper(item) for item in self.list]
 
@@ -111,6 +250,24 @@ class DictContainer(MutableMapping):
         self.update(args)  # Must be a sequence of tuples
         self.update(kwargs)  # Order of kwargs is not preserved
 
+    @classmethod
+    def _from_trusted(cls, items, oktypes, parent):
+        """
+        Wrap an OrderedDict of items that are known to be valid,
+        without copying it or checking the type of each item.
+        """
+        obj = object.__new__(cls)
+        obj.oktypes = oktypes
+        obj.parent = parent
+        obj.location = None
+        obj.dict = items
+        set_attr = _set_attr
+        for item in items.values():
+            if type(item) is not RawJSON:
+                set_attr(item, 'parent', parent)
+                set_attr(item, 'location', None)
+        return obj
+
     def __contains__(self, item):
         return item in self.dict
 
@@ -118,14 +275,23 @@ class DictContainer(MutableMapping):
         return len(self.dict)
 
     def __getitem__(self, k):
-        return attach(self.dict[k], self.parent, self.location)
+        item = self.dict[k]
+        if type(item) is RawJSON:
+            item = self.dict[k] = item.decode()
+            attach(item, self.parent, self.location)
+        return item
 
     def __delitem__(self, k):
-        del self.dict[k]
+        old = self.dict.pop(k)
+        invalidate(self.parent)
+        reindex(self.parent, [old], ())
 
     def __setitem__(self, k, v):
-        v = check_type(v, self.oktypes)
+        v = attach(check_item(v, self.oktypes), self.parent, self.location)
+        old = self.dict.get(k)
         self.dict[k] = v
+        invalidate(self.parent)
+        reindex(self.parent, [old], [v])
 
     def __str__(self):
         return self.__repr__()
@@ -136,25 +302,180 @@ class DictContainer(MutableMapping):
     def __iter__(self):
         return self.dict.__iter__()
 
+    def __deepcopy__(self, memo):
+        items = OrderedDict((k, copy.deepcopy(v, memo))
+                            for k, v in self.dict.items())
+        return self._from_trusted(items, self.oktypes,
+                                  memo.get(id(self.parent)))
+
     def to_json(self):
         items = self.dict.items()
         return OrderedDict((k, to_json_wrapper(v)) for k, v in items)
         return [item.to_json() for item in self.dict]
 
 
+class TrackedList(list):
+    """
+    List that notifies its owner element when modified in place
+    (used for attributes such as ``.classes``, which are plain lists
+    instead of ListContainers)
+    """
+
+    __slots__ = ['owner']
+
+    def __init__(self, iterable=(), owner=None):
+        list.__init__(self, iterable)
+        self.owner = owner
+
+    def __deepcopy__(self, memo):
+        # The items are strings or numbers
+        return TrackedList(self, memo.get(id(self.owner)))
+
+
+class TrackedDict(OrderedDict):
+    """
+    OrderedDict that notifies its owner element when modified in place
+    (used for ``.attributes``)
+    """
+
+    __slots__ = ['owner']
+
+    def __init__(self, items=(), owner=None):
+        OrderedDict.__init__(self, items)
+        self.owner = owner
+
+    def __repr__(self):
+        return repr(OrderedDict(self))
+
+    def __deepcopy__(self, memo):
+        return TrackedDict(self.items(), memo.get(id(self.owner)))
+
+
+def _notify_owner(method):
+    def wrapper(self, *args, **kwargs):
+        ans = method(self, *args, **kwargs)
+        invalidate(getattr(self, 'owner', None))  # Not set while unpickling
+        return ans
+    wrapper.__name__ = method.__name__
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+
+for _name in ['__setitem__', '__delitem__', '__iadd__', '__imul__', 'append',
+              'extend', 'insert', 'pop', 'remove', 'clear', 'sort', 'reverse']:
+    setattr(TrackedList, _name, _notify_owner(getattr(list, _name)))
+
+for _name in ['__setitem__', '__delitem__', 'pop', 'popitem', 'clear',
+              'update', 'setdefault', 'move_to_end']:
+    setattr(TrackedDict, _name, _notify_owner(getattr(OrderedDict, _name)))
+
+
+class RawJSON(object):
+    """
+    Placeholder for an element that has not been decoded yet
+    (see the *lazy* argument of :func:`.load`).
+
+    ListContainer and DictContainer decode it the first time the item is
+    accessed; until then, it is written back as the original JSON text.
+    """
+
+    __slots__ = ['text', 'decoder']
+
+    def __init__(self, text, decoder):
+        self.text = text
+        self.decoder = decoder  # json.JSONDecoder that builds the elements
+
+    def decode(self):
+        elem = self.decoder.decode(self.text)
+        # Until modified, the element can be written back as this text
+        elem._cache = {'json': self.text}
+        return elem
+
+    def __repr__(self):
+        return 'RawJSON({})'.format(self.text[:40])
+
+    def __deepcopy__(self, memo):
+        return self  # Never modified
+
+    def to_json(self):
+        return json.loads(self.text)
+
+
 # ---------------------------
 # Functions
 # ---------------------------
 
+def invalidate(element):
+    if element is not None:
+        element._invalidate()
+
+
+def reindex(element, removed, added):
+    """
+    Report to the indexes of the document (see :meth:`.Doc.find_all`)
+    that items were removed from or added to the children of the element
+    """
+    if element is not None:
+        element._reindex(removed, added)
+
+
+def check_item(item, oktypes):
+    if type(item) is RawJSON:
+        return item  # Validated once decoded
+    return check_type(item, oktypes)
+
+
 def attach(element, parent, location):
-    if not isinstance(element, (int, str, bool)):
-        element.parent = parent
-        element.location = location
-    else:
-        print(element, 'has no parent')
+    """
+    Set the parent of an element that enters a container, and return it.
+
+    If the element is taken from another parent, the data cached in that
+    parent and its ancestors is discarded: the element may still be one of
+    its children (as the items of header.content in
+    Plain(*header.content)), but its later changes only reach the new
+    parent. For the same reason, the index of the document it is taken
+    from (see :meth:`.Doc.find_all`) is dropped, and built again when
+    needed.
+    """
+    old = getattr(element, 'parent', _missing)
+    if old is _missing:
+        return element  # RawJSON, or an int, str or bool
+    if old is not None and \
+            (old is not parent or element.location != location):
+        _taken(old, element)
+    # The parent is not part of the element, so there is nothing
+    # to invalidate (see Element.__setattr__)
+    _set_attr(element, 'parent', parent)
+    _set_attr(element, 'location', location)
+    if element._root is not None:
+        element._forget_root()
     return element
 
 
+def _taken(parent, element):
+    """Forget what the parent (and its document) knew about the element"""
+    parent._invalidate()
+    doc = parent if parent.parent is None else parent.doc
+    if doc is not None and doc._index is not None and \
+            is_child(parent, element):
+        _set_attr(doc, '_index', None)
+
+
+def is_child(parent, element):
+    """Whether the element is in the children of its parent"""
+    obj = getattr(parent, element.location or 'content', None)
+    if isinstance(obj, ListContainer):
+        return obj._contains(element)
+    elif isinstance(obj, DictContainer):
+        return any(v is element for v in obj.dict.values())
+    else:
+        return obj is element
+
+
+_set_attr = object.__setattr__
+_missing = object()
+
+
 def to_json_wrapper(e):
     if isinstance(e, str):
         return e
@@ -9,8 +9,9 @@ Classes corresponding to Pandoc elements
 from collections import OrderedDict
 
 from .utils import check_type, check_group, encode_dict
-from .containers import ListContainer, DictContainer
-from .base import Element, Block, Inline, MetaValue
+from .containers import ListContainer, DictContainer, TrackedList, TrackedDict
+from .containers import attach
+from .base import Element, Block, Inline, MetaValue, _ElementIndex
 
 
 # ---------------------------
@@ -65,17 +66,72 @@ class Doc(Element):
 
     @property
     def metadata(self):
-        self._metadata.parent = self
-        self._metadata.location = 'metadata'
         return self._metadata
 
     @metadata.setter
     def metadata(self, value):
-        if isinstance(value, MetaMap):
-            value = value.content
-        else:
-            value = OrderedDict(value)
-        self._metadata = MetaMap(*value.items())
+        if not isinstance(value, MetaMap):
+            value = MetaMap(*OrderedDict(value).items())
+        self._metadata = attach(value, self, 'metadata')
+
+    def find_all(self, cls):
+        """
+        Return the elements of the document that are instances of the
+        given class (or tuple of classes).
+
+        The first call indexes the entire document; the index is then
+        kept up to date as the document is modified, so later calls only
+        take time proportional to the number of results. For each class,
+        the elements are in document order, except those added after
+        the index was built, which come last.
+
+        .. code-block:: python
+
+            headers = doc.find_all(Header)
+
+        :param cls: element class, such as :class:`Header` or :class:`Inline`
+        :type cls: :class:`type` | :class:`tuple`
+        :rtype: :class:`list` of :class:`Element`
+        """
+        return self._get_index().find_all(cls)
+
+    def find_by_id(self, identifier):
+        """
+        Return the element of the document with the given identifier
+        (such as a :class:`Header`, :class:`Div`, :class:`Span`,
+        :class:`Image` or :class:`CodeBlock`), or None if there is none.
+        If several elements share the identifier, the first one indexed
+        is returned (see :meth:`duplicate_ids`).
+
+        Like :meth:`find_all`, this uses an index of the document that is
+        built on the first call and then kept up to date, including when
+        the ``identifier`` of an element is changed.
+
+        .. code-block:: python
+
+            def resolve(elem, doc):
+                if isinstance(elem, Link) and elem.url.startswith('#'):
+                    target = doc.find_by_id(elem.url[1:])
+
+        :param identifier: identifier, without the leading ``#``
+        :type identifier: :class:`str`
+        :rtype: :class:`Element` | ``None``
+        """
+        return self._get_index().find_by_id(identifier)
+
+    def duplicate_ids(self):
+        """
+        Return the identifiers used by more than one element of the
+        document, mapped to the list of these elements.
+
+        :rtype: :class:`dict`
+        """
+        return self._get_index().duplicate_ids()
+
+    def _get_index(self):
+        if getattr(self, '_index', None) is None:
+            self._index = _ElementIndex(self)
+        return self._index
 
     def to_json(self):
         # Overrides default method
@@ -472,8 +528,8 @@ class Cite(Inline):
     @citations.setter
     def citations(self, value):
         value = value.list if isinstance(value, ListContainer) else list(value)
-        self._citations = ListContainer(*value, oktypes=Citation, parent=self)
-        self._citations.location = 'citations'
+        self._citations = ListContainer(*value, oktypes=Citation,
+                                        parent=self, location='citations')
 
     def _slots_to_json(self):
         return [self.citations.to_json(), self.content.to_json()]
@@ -519,8 +575,8 @@ class Citation(Element):
     @prefix.setter
     def prefix(self, value):
         value = value.list if isinstance(value, ListContainer) else list(value)
-        self._prefix = ListContainer(*value, oktypes=Inline, parent=self)
-        self._prefix.location = 'prefix'
+        self._prefix = ListContainer(*value, oktypes=Inline,
+                                     parent=self, location='prefix')
 
     @property
     def suffix(self):
@@ -529,8 +585,8 @@ class Citation(Element):
     @suffix.setter
     def suffix(self, value):
         value = value.list if isinstance(value, ListContainer) else list(value)
-        self._suffix = ListContainer(*value, oktypes=Inline, parent=self)
-        self._suffix.location = 'suffix'
+        self._suffix = ListContainer(*value, oktypes=Inline,
+                                     parent=self, location='suffix')
 
     def to_json(self):
         # Replace default .to_json ; we don't need _slots_to_json()
@@ -897,8 +953,8 @@ class DefinitionItem(Element):
     @term.setter
     def term(self, value):
         value = value.list if isinstance(value, ListContainer) else list(value)
-        self._term = ListContainer(*value, oktypes=Inline, parent=self)
-        self._term.location = 'term'
+        self._term = ListContainer(*value, oktypes=Inline,
+                                   parent=self, location='term')
 
     @property
     def definitions(self):
@@ -908,8 +964,8 @@ class DefinitionItem(Element):
     def definitions(self, value):
         value = value.list if isinstance(value, ListContainer) else list(value)
         self._definitions = ListContainer(*value,
-                                          oktypes=Definition, parent=self)
-        self._definitions.location = 'definitions'
+                                          oktypes=Definition, parent=self,
+                                          location='definitions')
 
     def to_json(self):
         return [self.term.to_json(), self.definitions.to_json()]
@@ -1093,6 +1149,9 @@ class Table(Block):
                 msg += 'Expected {} but received {}\n'.format(self.cols, len(self.width))
                 raise IndexError(msg)
 
+        # Notify the table when modified in place
+        self.alignment = TrackedList(self.alignment, self)
+        self.width = TrackedList(self.width, self)
 
     @property
     def header(self):
@@ -1104,13 +1163,13 @@ class Table(Block):
             self._header = None
             return
 
-        value = value.content if isinstance(value, TableRow) else list(value)
-        self._header = TableRow(*value)
-        self._header.parent = self
-        self._header.location = 'header'
-        if hasattr(self, 'cols') and len(value) != self.cols:
+        if not isinstance(value, TableRow):
+            value = TableRow(*value)
+        self._header = attach(value, self, 'header')
+        if hasattr(self, 'cols') and len(value.content) != self.cols:
             msg = 'table header has an incorrect number of columns:'
-            msg += ' {} rows but expected {}'.format(len(value), self.cols)
+            msg += ' {} rows but expected {}'.format(
+                len(value.content), self.cols)
             raise IndexError(msg)
 
     @property
@@ -1120,8 +1179,8 @@ class Table(Block):
     @caption.setter
     def caption(self, value):
         value = value.list if isinstance(value, ListContainer) else list(value)
-        self._caption = ListContainer(*value, oktypes=Inline, parent=self)
-        self._caption.location = 'caption'
+        self._caption = ListContainer(*value, oktypes=Inline,
+                                      parent=self, location='caption')
 
     def _slots_to_json(self):
         caption = [chunk.to_json() for chunk in self.caption]
@@ -1372,6 +1431,45 @@ SPECIAL_ELEMENTS = LIST_NUMBER_STYLES | LIST_NUMBER_DELIMITERS | \
 
 EMPTY_ELEMENTS = {Null, Space, HorizontalRule, SoftBreak, LineBreak}
 
+# Types allowed in the children of each element (i.e. the oktypes
+# of its containers), used by walk() to skip subtrees
+CHILD_TYPES = {
+    Doc: (MetaMap, Block),
+    Plain: (Inline,),
+    Para: (Inline,),
+    BlockQuote: (Block,),
+    Emph: (Inline,),
+    Strong: (Inline,),
+    Strikeout: (Inline,),
+    Superscript: (Inline,),
+    Subscript: (Inline,),
+    SmallCaps: (Inline,),
+    Note: (Block,),
+    Header: (Inline,),
+    Div: (Block,),
+    Span: (Inline,),
+    Quoted: (Inline,),
+    Cite: (Inline, Citation),
+    Citation: (Inline,),
+    Link: (Inline,),
+    Image: (Inline,),
+    ListItem: (Block,),
+    BulletList: (ListItem,),
+    OrderedList: (ListItem,),
+    Definition: (Block,),
+    DefinitionItem: (Inline, Definition),
+    DefinitionList: (DefinitionItem,),
+    LineItem: (Inline,),
+    LineBlock: (LineItem,),
+    TableCell: (Block,),
+    TableRow: (TableCell,),
+    Table: (TableRow, Inline),
+    MetaList: (MetaValue,),
+    MetaMap: (MetaValue,),
+    MetaInlines: (Inline,),
+    MetaBlocks: (Block,),
+}
+
 
 # ---------------------------
 # Functions
@@ -1404,15 +1502,49 @@ def _decode_row(row):
     return TableRow(*row)
 
 
-def from_json(data):
+def from_json(data, trusted=False):
+    """
+    Decode a JSON object (received as a list of key-value pairs, as done by
+    the ``object_pairs_hook`` argument of :func:`json.load`).
+
+    With ``trusted=True`` the input is assumed to be valid Pandoc output,
+    so the elements are built without type checks (see :func:`.load`).
+    """
+
+    # Standard cases
+    # Depending on the API we will have
+    # - New API: ('t', 'Space')
+    # - Old API: ('t', 'Space'), ('c', [])
+    n = len(data)
+    if n == 2:
+        (k0, v0), (k1, v1) = data
+        if k0 == 't' and k1 == 'c':
+            tag, c = v0, v1
+        elif k0 == 'c' and k1 == 't':
+            tag, c = v1, v0
+        else:
+            return _from_json_other(data, trusted)
+    elif n == 1 and data[0][0] == 't':
+        tag, c = data[0][1], None
+    else:
+        return _from_json_other(data, trusted)
+
+    try:
+        decoder = _TRUSTED_DECODERS[tag] if trusted else _DECODERS[tag]
+    except KeyError:
+        raise Exception('unknown tag: ' + tag)
+    return decoder(c)
+
 
-    # OrderedDict should be fast in 3.6+, so don't worry about speed:
-    # https://twitter.com/raymondh/status/773978885092323328
+def _from_json_other(data, trusted=False):
+    # JSON objects that are not elements (documents and metadata dicts)
     data = OrderedDict(data)
 
     # Metadata key (legacy)
     if 'unMeta' in data:
         assert len(data) == 1
+        if trusted:
+            return _trusted_meta_map(data['unMeta'])
         return MetaMap(*data['unMeta'].items())
 
     # Document (new API)
@@ -1421,115 +1553,363 @@ def from_json(data):
         api = data['pandoc-api-version']
         meta = data['meta']
         items = data['blocks']
+        if trusted:
+            return _trusted_doc(items, _trusted_meta_map(meta), api)
         return Doc(*items, api_version=api, metadata=meta)
 
     # Metadata contents (including empty metadata)
-    if 't' not in data:
-        return data
-
-    # Standard cases
-
-    # Depending on the API we will have
-    # - New API: ('t', 'Space')
-    # - Old API: ('t', 'Space'), ('c', [])
-    assert (len(data) == 1) or (len(data) == 2 and 'c' in data)
-    tag = data['t']
-    c = data.get('c')
-
-    # Maybe using globals() is too slow?
-    # TODO: Try w/out globals, as json.load() is a bit slow
-
-    if tag == 'Str':
-        return Str(c)
-
-    elif tag in ('Null', 'Space', 'HorizontalRule', 'SoftBreak', 'LineBreak'):
-        return globals()[tag]()
-
-    elif tag in ('Plain', 'Para', 'BlockQuote', 'Emph', 'Strong', 'Strikeout',
-                 'Superscript', 'Subscript', 'SmallCaps', 'Note'):
-        return globals()[tag](*c)
-
-    elif tag in ('Div', 'Span'):
-        return globals()[tag](*c[1], **_decode_ica(c[0]))
-
-    elif tag == 'Header':
-        return Header(*c[2], level=c[0], **_decode_ica(c[1]))
-
-    elif tag == 'Quoted':
-        return Quoted(*c[1], quote_type=c[0])
-
-    elif tag == 'Link':
-        return Link(*c[1], url=c[2][0], title=c[2][1], **_decode_ica(c[0]))
-
-    elif tag == 'Image':
-        return Image(*c[1], url=c[2][0], title=c[2][1], **_decode_ica(c[0]))
-
-    elif tag == 'CodeBlock':
-        return CodeBlock(text=c[1], **_decode_ica(c[0]))
-
-    elif tag == 'RawBlock':
-        return RawBlock(text=c[1], format=c[0])
-
-    elif tag == 'Code':
-        return Code(text=c[1], **_decode_ica(c[0]))
-
-    elif tag == 'Math':
-        return Math(text=c[1], format=c[0])
-
-    elif tag == 'RawInline':
-        return RawInline(text=c[1], format=c[0])
-
-    elif tag == 'Cite':
-        items = [_decode_citation(dct) for dct in c[0]]
-        return Cite(*c[1], citations=items)
-
-    elif tag == 'BulletList':
-        items = [ListItem(*item) for item in c]
-        return BulletList(*items)
-
-    elif tag == 'OrderedList':
-        items = [ListItem(*item) for item in c[1]]
-        return OrderedList(*items, start=c[0][0],
-                           style=c[0][1], delimiter=c[0][2])
-
-    elif tag == 'DefinitionList':
-        items = [_decode_definition_item(item) for item in c]
-        return DefinitionList(*items)
-
-    elif tag == 'LineBlock':
-        items = [LineItem(*item) for item in c]
-        return LineBlock(*items)
-
-    elif tag == 'Table':
-        header = _decode_row(c[3])
-        data = [_decode_row(x) for x in c[4]]
-        return Table(*data, caption=c[0], alignment=c[1], width=c[2],
-                     header=header)
-
-    elif tag == 'MetaList':
-        return MetaList(*c)
-
-    elif tag == 'MetaMap':
-        return MetaMap(*c.items())
-
-    elif tag == 'MetaInlines':
-        return MetaInlines(*c)
+    return data
+
+
+# Map each tag to the function that builds the element from its contents
+_DECODERS = {
+    'Str': Str,
+
+    'Null': lambda c: Null(),
+    'Space': lambda c: Space(),
+    'HorizontalRule': lambda c: HorizontalRule(),
+    'SoftBreak': lambda c: SoftBreak(),
+    'LineBreak': lambda c: LineBreak(),
+
+    'Plain': lambda c: Plain(*c),
+    'Para': lambda c: Para(*c),
+    'BlockQuote': lambda c: BlockQuote(*c),
+    'Emph': lambda c: Emph(*c),
+    'Strong': lambda c: Strong(*c),
+    'Strikeout': lambda c: Strikeout(*c),
+    'Superscript': lambda c: Superscript(*c),
+    'Subscript': lambda c: Subscript(*c),
+    'SmallCaps': lambda c: SmallCaps(*c),
+    'Note': lambda c: Note(*c),
+
+    'Div': lambda c: Div(*c[1], **_decode_ica(c[0])),
+    'Span': lambda c: Span(*c[1], **_decode_ica(c[0])),
+    'Header': lambda c: Header(*c[2], level=c[0], **_decode_ica(c[1])),
+    'Quoted': lambda c: Quoted(*c[1], quote_type=c[0]),
+    'Link': lambda c: Link(*c[1], url=c[2][0], title=c[2][1],
+                           **_decode_ica(c[0])),
+    'Image': lambda c: Image(*c[1], url=c[2][0], title=c[2][1],
+                             **_decode_ica(c[0])),
+    'CodeBlock': lambda c: CodeBlock(text=c[1], **_decode_ica(c[0])),
+    'RawBlock': lambda c: RawBlock(text=c[1], format=c[0]),
+    'Code': lambda c: Code(text=c[1], **_decode_ica(c[0])),
+    'Math': lambda c: Math(text=c[1], format=c[0]),
+    'RawInline': lambda c: RawInline(text=c[1], format=c[0]),
+    'Cite': lambda c: Cite(*c[1],
+                           citations=[_decode_citation(x) for x in c[0]]),
+
+    'BulletList': lambda c: BulletList(*[ListItem(*x) for x in c]),
+    'OrderedList': lambda c: OrderedList(*[ListItem(*x) for x in c[1]],
+                                         start=c[0][0], style=c[0][1],
+                                         delimiter=c[0][2]),
+    'DefinitionList': lambda c: DefinitionList(
+        *[_decode_definition_item(x) for x in c]),
+    'LineBlock': lambda c: LineBlock(*[LineItem(*x) for x in c]),
+    'Table': lambda c: Table(*[_decode_row(x) for x in c[4]],
+                             caption=c[0], alignment=c[1], width=c[2],
+                             header=_decode_row(c[3])),
+
+    'MetaList': lambda c: MetaList(*c),
+    'MetaMap': lambda c: MetaMap(*c.items()),
+    'MetaInlines': lambda c: MetaInlines(*c),
+    'MetaBlocks': lambda c: MetaBlocks(*c),
+    'MetaString': MetaString,
+    'MetaBool': MetaBool,
+}
 
-    elif tag == 'MetaBlocks':
-        return MetaBlocks(*c)
+# Tags such as 'DoubleQuote' or 'AlignLeft' are decoded into plain strings
+_DECODERS.update((tag, lambda c, tag=tag: tag) for tag in SPECIAL_ELEMENTS)
 
-    elif tag == 'MetaString':
-        return MetaString(c)
 
-    elif tag == 'MetaBool':
-        assert c in {True, False}, c
-        return MetaBool(c)
+# ---------------------------
+# Trusted decoders
+# ---------------------------
+# Used by from_json(..., trusted=True); they fill the slots directly
+# instead of calling __init__, so the JSON must be valid Pandoc output
 
-    elif tag in SPECIAL_ELEMENTS:
-        return tag
+# Slot assignment without Element.__setattr__, as new elements have no
+# cached data to invalidate
+_set = object.__setattr__
+
+
+def _new(cls):
+    elem = object.__new__(cls)
+    _set(elem, 'parent', None)
+    _set(elem, 'location', None)
+    _set(elem, '_cache', None)
+    _set(elem, '_root', None)
+    return elem
+
+
+def _trusted_empty(cls):
+    return lambda c: _new(cls)
+
+
+def _trusted_text(cls):
+    def decode(c):
+        elem = _new(cls)
+        _set(elem, 'text', c)
+        return elem
+    return decode
+
+
+def _trusted_formatted_text(cls):
+    # RawBlock, RawInline and Math
+    def decode(c):
+        elem = _new(cls)
+        _set(elem, 'format', c[0])
+        _set(elem, 'text', c[1])
+        return elem
+    return decode
+
+
+def _trusted_container(cls, oktypes):
+    def decode(c):
+        elem = _new(cls)
+        _set(elem, '_content', ListContainer._from_trusted(c, oktypes, elem))
+        return elem
+    return decode
+
+
+def _set_trusted_ica(elem, ica):
+    _set(elem, 'identifier', ica[0])
+    _set(elem, 'classes', TrackedList(ica[1], elem))
+    _set(elem, 'attributes', TrackedDict(ica[2], elem))
+
+
+def _trusted_attr_container(cls, oktypes):
+    # Div and Span
+    def decode(c):
+        elem = _new(cls)
+        _set_trusted_ica(elem, c[0])
+        content = ListContainer._from_trusted(c[1], oktypes, elem)
+        _set(elem, '_content', content)
+        return elem
+    return decode
+
+
+def _trusted_attr_text(cls):
+    # CodeBlock and Code
+    def decode(c):
+        elem = _new(cls)
+        _set_trusted_ica(elem, c[0])
+        _set(elem, 'text', c[1])
+        return elem
+    return decode
+
+
+def _trusted_target(cls):
+    # Link and Image
+    def decode(c):
+        elem = _new(cls)
+        _set_trusted_ica(elem, c[0])
+        content = ListContainer._from_trusted(c[1], Inline, elem)
+        _set(elem, '_content', content)
+        _set(elem, 'url', c[2][0])
+        _set(elem, 'title', c[2][1])
+        return elem
+    return decode
+
+
+def _trusted_header(c):
+    elem = _new(Header)
+    _set(elem, 'level', c[0])
+    _set_trusted_ica(elem, c[1])
+    _set(elem, '_content', ListContainer._from_trusted(c[2], Inline, elem))
+    return elem
+
+
+def _trusted_quoted(c):
+    elem = _new(Quoted)
+    _set(elem, 'quote_type', c[0])
+    _set(elem, '_content', ListContainer._from_trusted(c[1], Inline, elem))
+    return elem
+
+
+def _trusted_citation(dct):
+    elem = _new(Citation)
+    _set(elem, 'id', dct['citationId'])
+    _set(elem, 'mode', dct['citationMode'])
+    _set(elem, 'hash', dct['citationHash'])
+    _set(elem, 'note_num', dct['citationNoteNum'])
+    prefix = ListContainer._from_trusted(dct['citationPrefix'],
+                                         Inline, elem, 'prefix')
+    suffix = ListContainer._from_trusted(dct['citationSuffix'],
+                                         Inline, elem, 'suffix')
+    _set(elem, '_prefix', prefix)
+    _set(elem, '_suffix', suffix)
+    return elem
+
+
+def _trusted_cite(c):
+    elem = _new(Cite)
+    citations = [_trusted_citation(dct) for dct in c[0]]
+    citations = ListContainer._from_trusted(citations, Citation,
+                                            elem, 'citations')
+    _set(elem, '_citations', citations)
+    _set(elem, '_content', ListContainer._from_trusted(c[1], Inline, elem))
+    return elem
+
+
+_trusted_list_item = _trusted_container(ListItem, Block)
+_trusted_line_item = _trusted_container(LineItem, Inline)
+_trusted_definition = _trusted_container(Definition, Block)
+_trusted_table_cell = _trusted_container(TableCell, Block)
+
+
+def _trusted_bullet_list(c):
+    elem = _new(BulletList)
+    items = [_trusted_list_item(x) for x in c]
+    _set(elem, '_content', ListContainer._from_trusted(items, ListItem, elem))
+    return elem
+
+
+def _trusted_ordered_list(c):
+    elem = _new(OrderedList)
+    start, style, delimiter = c[0]
+    _set(elem, 'start', start)
+    _set(elem, 'style', style)
+    _set(elem, 'delimiter', delimiter)
+    items = [_trusted_list_item(x) for x in c[1]]
+    _set(elem, '_content', ListContainer._from_trusted(items, ListItem, elem))
+    return elem
+
+
+def _trusted_definition_item(item):
+    elem = _new(DefinitionItem)
+    term, definitions = item
+    definitions = [_trusted_definition(x) for x in definitions]
+    term = ListContainer._from_trusted(term, Inline, elem, 'term')
+    definitions = ListContainer._from_trusted(definitions, Definition,
+                                              elem, 'definitions')
+    _set(elem, '_term', term)
+    _set(elem, '_definitions', definitions)
+    return elem
+
+
+def _trusted_definition_list(c):
+    elem = _new(DefinitionList)
+    items = [_trusted_definition_item(x) for x in c]
+    items = ListContainer._from_trusted(items, DefinitionItem, elem)
+    _set(elem, '_content', items)
+    return elem
+
+
+def _trusted_line_block(c):
+    elem = _new(LineBlock)
+    items = [_trusted_line_item(x) for x in c]
+    _set(elem, '_content', ListContainer._from_trusted(items, LineItem, elem))
+    return elem
+
+
+def _trusted_row(row):
+    elem = _new(TableRow)
+    cells = [_trusted_table_cell(x) for x in row]
+    _set(elem, '_content', ListContainer._from_trusted(cells, TableCell, elem))
+    return elem
+
+
+def _trusted_table(c):
+    elem = _new(Table)
+    rows = [_trusted_row(x) for x in c[4]]
+    _set(elem, '_content', ListContainer._from_trusted(rows, TableRow, elem))
+    caption = ListContainer._from_trusted(c[0], Inline, elem, 'caption')
+    _set(elem, '_caption', caption)
+    _set(elem, 'alignment', TrackedList(c[1], elem))
+    _set(elem, 'width', TrackedList(c[2], elem))
+
+    if c[3]:
+        header = _trusted_row(c[3])
+        _set(header, 'parent', elem)
+        _set(header, 'location', 'header')
+        _set(elem, '_header', header)
+    else:
+        _set(elem, '_header', None)
 
+    _set(elem, 'rows', len(rows))
+    if rows:
+        _set(elem, 'cols', len(rows[0].content))
+    elif elem._header is not None:
+        _set(elem, 'cols', len(elem._header.content))
     else:
-        raise Exception('unknown tag: ' + tag)
+        _set(elem, 'cols', 0)
+    return elem
+
+
+def _trusted_meta_map(c):
+    elem = _new(MetaMap)
+    _set(elem, '_content', DictContainer._from_trusted(c, MetaValue, elem))
+    return elem
+
+
+def _trusted_meta_bool(c):
+    elem = _new(MetaBool)
+    _set(elem, 'boolean', c)
+    return elem
+
+
+def _trusted_doc(blocks, metadata, api_version=None, format='html'):
+    doc = _new(Doc)
+    _set(doc, '_content', ListContainer._from_trusted(blocks, Block, doc))
+    _set(doc, '_metadata', metadata)
+    _set(metadata, 'parent', doc)
+    _set(metadata, 'location', 'metadata')
+    _set(doc, 'format', format)
+    if api_version is not None:
+        api_version = tuple(api_version)
+    _set(doc, 'api_version', api_version)
+    return doc
+
+
+_TRUSTED_DECODERS = {
+    'Str': _trusted_text(Str),
+
+    'Null': _trusted_empty(Null),
+    'Space': _trusted_empty(Space),
+    'HorizontalRule': _trusted_empty(HorizontalRule),
+    'SoftBreak': _trusted_empty(SoftBreak),
+    'LineBreak': _trusted_empty(LineBreak),
+
+    'Plain': _trusted_container(Plain, Inline),
+    'Para': _trusted_container(Para, Inline),
+    'BlockQuote': _trusted_container(BlockQuote, Block),
+    'Emph': _trusted_container(Emph, Inline),
+    'Strong': _trusted_container(Strong, Inline),
+    'Strikeout': _trusted_container(Strikeout, Inline),
+    'Superscript': _trusted_container(Superscript, Inline),
+    'Subscript': _trusted_container(Subscript, Inline),
+    'SmallCaps': _trusted_container(SmallCaps, Inline),
+    'Note': _trusted_container(Note, Block),
+
+    'Div': _trusted_attr_container(Div, Block),
+    'Span': _trusted_attr_container(Span, Inline),
+    'Header': _trusted_header,
+    'Quoted': _trusted_quoted,
+    'Link': _trusted_target(Link),
+    'Image': _trusted_target(Image),
+    'CodeBlock': _trusted_attr_text(CodeBlock),
+    'RawBlock': _trusted_formatted_text(RawBlock),
+    'Code': _trusted_attr_text(Code),
+    'Math': _trusted_formatted_text(Math),
+    'RawInline': _trusted_formatted_text(RawInline),
+    'Cite': _trusted_cite,
+
+    'BulletList': _trusted_bullet_list,
+    'OrderedList': _trusted_ordered_list,
+    'DefinitionList': _trusted_definition_list,
+    'LineBlock': _trusted_line_block,
+    'Table': _trusted_table,
+
+    'MetaList': _trusted_container(MetaList, MetaValue),
+    'MetaMap': _trusted_meta_map,
+    'MetaInlines': _trusted_container(MetaInlines, Inline),
+    'MetaBlocks': _trusted_container(MetaBlocks, Block),
+    'MetaString': _trusted_text(MetaString),
+    'MetaBool': _trusted_meta_bool,
+}
+
+_TRUSTED_DECODERS.update((tag, lambda c, tag=tag: tag)
+                         for tag in SPECIAL_ELEMENTS)
 
 
 def builtin2meta(val):
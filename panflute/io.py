@@ -8,6 +8,10 @@ I/O related functions
 # ---------------------------
 
 from .elements import Element, Doc, from_json, ListContainer
+from .base import _set_cache
+from .containers import RawJSON
+from .elements import MetaMap, _trusted_doc, _trusted_meta_map
+from .codec import get_codec
 
 # These will get modified if using Pandoc legacy (<1.8)
 from .elements import (Citation, Table, OrderedList, Quoted,
@@ -16,9 +20,11 @@ from .elements import (Citation, Table, OrderedList, Quoted,
 import io
 import os
 import sys
+import re
 import json
 import codecs  # Used in sys.stdout writer
 from collections import OrderedDict
+from contextlib import contextmanager
 from functools import partial
 
 
@@ -26,7 +32,7 @@ from functools import partial
 # Functions
 # ---------------------------
 
-def load(input_stream=None):
+def load(input_stream=None, trusted=False, lazy=False):
     """
     Load JSON-encoded document and return a :class:`.Doc` element.
 
@@ -47,55 +53,148 @@ def load(input_stream=None):
         >>> f = io.StringIO(raw)
         >>> doc = pf.load(f)
 
+    If the input comes straight from Pandoc, you can use ``trusted=True``
+    to skip the type checks done when constructing each element,
+    which makes loading considerably faster.
+
+    Each top-level block (and each value of the metadata) keeps the JSON
+    text it was decoded from, so :func:`.dump` writes back the ones that
+    were not modified as they were, instead of encoding them again.
+
     :param input_stream: text stream used as input
         (default is :data:`sys.stdin`)
+    :param trusted: if True, assume the input is valid Pandoc JSON and
+        build the elements without validating them (default is False)
+    :type trusted: :class:`bool`
+    :param lazy: if True, only decode each top-level block when it is
+        first accessed (through ``doc.content``, :meth:`.Element.walk`,
+        navigation, etc.). The same goes for the value of each metadata
+        key, which is decoded when first accessed (e.g. through
+        ``doc.metadata[key]`` or :meth:`.Doc.get_metadata`).
+        Blocks and values that are never accessed are written back by
+        :func:`.dump` as they were. Note that errors in the input might
+        then be raised when a block is accessed instead of when loading
+        the document. (default is False)
+    :type lazy: :class:`bool`
     :rtype: :class:`.Doc`
     """
 
     if input_stream is None:
         input_stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
 
-    # Load JSON and validate it
-    doc = json.load(input_stream, object_pairs_hook=from_json)
-
-    # Notes:
-    # - We use 'object_pairs_hook' instead of 'object_hook' to preserve the
-    #   order of the metadata.
-    # - The hook gets called for dicts (not lists), and the deepest dicts
-    #   get called first (so you can ensure that when you receive a dict,
-    #   its contents have already been fed to the hook).
-
-    # Compatibility:
-    # - Before Pandoc 1.8 (1.7 or earlier, AKA "Pandoc Legacy"),
-    #   the JSON is a list:
-    #   [{"unMeta":{META}},[BLOCKS]]
-    # - Afterwards, it's a dict:
-    #   {"pandoc-api-version" : [MAJ, MIN, REV],
-    #    "meta" : META, "blocks": BLOCKS}
-    # - This means that on legacy, the hook WILL NOT get called on the entire
-    #   document and we need to create the Doc() element by hand
-
-    # Corner cases:
-    # - If META is missing, 'object_pairs_hook' will receive an empty list
-
-    # Output format
-    format = sys.argv[1] if len(sys.argv) > 1 else 'html'
-
-    # API Version
-    if isinstance(doc, Doc):
-        # Modern Pandoc
-        doc.format = format
-        pass
-    else:
-        # Legacy Pandoc
-        metadata, items = doc
-        assert type(items) == list
-        assert len(doc) == 2, 'json.load returned list with unexpected size:'
-        doc = Doc(*items, metadata=metadata, format=format)
+    if lazy:
+        doc, blocks = _load_blocks(input_stream, trusted, raw=True)
+        doc.content.list.extend(blocks)
+        return doc
 
+    doc, blocks = _load_blocks(input_stream, trusted, cache=True)
+    doc.content[:] = blocks
     return doc
 
 
+def load_blocks(input_stream=None, trusted=False):
+    """
+    Load a JSON-encoded document incrementally.
+
+    Unlike :func:`.load`, this returns a :class:`.Doc` element that only
+    has the metadata, together with an iterator that decodes and yields the
+    top--level blocks one at a time. Thus, the memory used is bounded by the
+    size of the largest block instead of the size of the entire document
+    (as long as the blocks are not kept in memory by the caller).
+
+    Example:
+
+        >>> import panflute as pf
+        >>> with open('some-document.json', encoding='utf-8') as f:
+        >>>     doc, blocks = pf.load_blocks(f)
+        >>>     for block in blocks:
+        >>>         print(block.tag)
+
+    Note: the blocks are not attached to the document (``doc.content``
+    remains empty). Also, in the rare case where the ``"blocks"`` key comes
+    before ``"meta"`` in the JSON, all the blocks have to be decoded
+    before the metadata is known.
+
+    :param input_stream: text stream used as input
+        (default is :data:`sys.stdin`)
+    :param trusted: if True, assume the input is valid Pandoc JSON
+        (see :func:`.load`)
+    :type trusted: :class:`bool`
+    :return: the document (without blocks) and an iterator of blocks
+    :rtype: (:class:`.Doc`, iterator of :class:`.Block`)
+    """
+
+    if input_stream is None:
+        input_stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+
+    return _load_blocks(input_stream, trusted)
+
+
+def _load_blocks(input_stream, trusted, raw=False, cache=False):
+    """
+    Same as load_blocks(); if raw is True, the blocks and the values of
+    the metadata are not decoded but returned as RawJSON placeholders,
+    and if cache is True they are decoded but keep their JSON text
+    (as RawJSON.decode does)
+    """
+    hook = partial(from_json, trusted=True) if trusted else from_json
+    reader = _JSONReader(input_stream, hook)
+    if raw or cache:
+        # The text of the whole document is kept, so read it at once
+        # (else values larger than a chunk are decoded more than once)
+        reader.chunk_size = -1
+    format = sys.argv[1] if len(sys.argv) > 1 else 'html'
+
+    # Legacy Pandoc: [{"unMeta":{META}},[BLOCKS]]
+    if reader.peek() == '[':
+        reader.expect('[')
+        if raw or cache:
+            reader.expect('{')
+            if reader.value() != 'unMeta':
+                raise ValueError('expected "unMeta" key in document')
+            reader.expect(':')
+            metadata = _read_object(reader, raw, cache)
+            reader.expect('}')
+        else:
+            metadata = reader.value()
+        reader.expect(',')
+        doc = _new_doc(metadata, None, format, trusted)
+        return doc, _iter_legacy_blocks(reader, raw, cache)
+
+    # Modern Pandoc:
+    # {"pandoc-api-version":[MAJ, MIN, REV], "meta":{META}, "blocks":[BLOCKS]}
+    api_version = metadata = blocks = None
+    reader.expect('{')
+    while True:
+        key = reader.value()
+        reader.expect(':')
+        if key == 'blocks' and api_version is not None and \
+                metadata is not None:
+            doc = _new_doc(metadata, api_version, format, trusted)
+            return doc, _iter_blocks(reader, raw, cache)
+        elif key == 'blocks':
+            # Metadata comes later, so we need to keep the blocks
+            blocks = list(_iter_array(reader, raw, cache))
+        elif key == 'meta':
+            if raw or cache:
+                metadata = _read_object(reader, raw, cache)
+            else:
+                metadata = reader.value()
+        elif key == 'pandoc-api-version':
+            api_version = reader.value()
+        else:
+            raise ValueError('unexpected key in document: {}'.format(key))
+
+        if reader.expect(',}') == '}':
+            break
+
+    reader.expect('')
+    if blocks is None or metadata is None:
+        raise ValueError('document lacks "blocks" or "meta" keys')
+    doc = _new_doc(metadata, api_version, format, trusted)
+    return doc, iter(blocks)
+
+
 def dump(doc, output_stream=None):
     """
     Dump a :class:`.Doc` object into a JSON-encoded text string.
@@ -121,6 +220,9 @@ def dump(doc, output_stream=None):
         >>>     pf.dump(doc, f)
         >>>     contents = f.getvalue()
 
+    The JSON is written by the fastest backend available (``orjson`` or
+    ``ujson`` if installed); see :func:`panflute.codec.set_codec`.
+
     :param doc: document, usually created with :func:`.load`
     :type doc: :class:`.Doc`
     :param output_stream: text stream used as output
@@ -128,44 +230,17 @@ def dump(doc, output_stream=None):
     """
 
     assert type(doc) == Doc, "panflute.dump needs input of type panflute.Doc"
-    if output_stream is None:
-        sys.stdout = codecs.getwriter("utf-8")(sys.stdout.detach())
-        output_stream = sys.stdout
+    output_stream = _get_output_stream(output_stream)
 
-    # Switch to legacy JSON output; eg: {'t': 'Space', 'c': []}
-    if doc.api_version is None:
-
-        # Switch .to_json() to legacy
-        Citation.backup = Citation.to_json
-        Citation.to_json = Citation.to_json_legacy
-
-        # Switch ._slots_to_json() to legacy
-        for E in [Table, OrderedList, Quoted, Math]:
-            E.backup = E._slots_to_json
-            E._slots_to_json = E._slots_to_json_legacy
-
-        # Switch .to_json() to method of base class
-        for E in EMPTY_ELEMENTS:
-            E.backup = E.to_json
-            E.to_json = Element.to_json
-
-    json_serializer = lambda elem: elem.to_json()
-
-    output_stream.write(json.dumps(
-        obj=doc,
-        default=json_serializer,  # Serializer
-        check_circular=False,
-        separators=(',', ':'),  # Compact separators, like Pandoc
-        ensure_ascii=False  # For Pandoc compat
-    ))
-
-    # Undo legacy changes
-    if doc.api_version is None:
-        Citation.to_json = Citation.backup
-        for E in [Table, OrderedList, Quoted, Math]:
-            E._slots_to_json = E.backup
-        for E in EMPTY_ELEMENTS:
-            E.to_json = E.backup
+    # Write the blocks a few at a time instead of building the JSON
+    # of the entire document in memory
+    writer = _JSONWriter(output_stream, get_codec())
+    with _json_api(doc.api_version):
+        head, tail = _doc_json_frame(doc, writer.codec)
+        writer.write(head)
+        writer.write_items(doc.content.list)
+        writer.write(tail)
+    writer.flush()
 
 
 def toJSONFilters(*args, **kwargs):
@@ -190,7 +265,7 @@ def toJSONFilter(*args, **kwargs):
 def run_filters(actions,
                 prepare=None, finalize=None,
                 input_stream=None, output_stream=None,
-                doc=None,
+                doc=None, streaming=False, fused=False, lazy=False,
                 **kwargs):
     """
     Receive a Pandoc document from the input stream (default is stdin),
@@ -209,6 +284,31 @@ def run_filters(actions,
       end; this allows for global operations on the document.
     - If ``doc`` is a :class:`.Doc` instead of ``None``, ``run_filters``
       will return the document instead of writing it to the output stream.
+    - With ``streaming=True``, the top--level blocks are read, filtered
+      and written one at a time, so memory use does not grow with the size
+      of the document and the output starts right away. This is only valid
+      for filters whose actions look at each block in isolation:
+
+      * all the actions are applied to a block before moving on to the
+        next one, and ``doc.content`` only holds the current block
+        (so ``elem.next`` and ``elem.prev`` are ``None`` for blocks);
+      * the metadata is walked and written before the blocks, so
+        changes made to it afterwards (e.g. in *finalize*) are lost.
+
+      Actions (or *prepare* and *finalize* functions) that need the
+      entire document can say so by setting an attribute
+      ``action.whole_document = True``; if any of them does, the
+      document is read and filtered all at once as usual.
+    - With ``fused=True``, the actions share a single walk through the
+      document: each element goes through all the actions in order, right
+      after its children went through all of them. An action receives
+      the element returned by the previous one (which is not walked
+      again); if an action returns a list, the remaining actions are
+      applied to each of its items, and if it returns ``[]``,
+      the remaining actions are skipped. Actions that need the previous
+      ones to be done with the entire document (e.g. because they look at
+      other elements) can opt out by setting an attribute
+      ``action.sequential = True``; they get a walk of their own.
 
     :param actions: sequence of functions; each function takes (element, doc)
      as argument, so a valid header would be ``def action(elem, doc):``
@@ -225,22 +325,44 @@ def run_filters(actions,
         (default is :data:`sys.stdout`)
     :param doc: ``None`` unless running panflute as a filter, in which case this will be a :class:`.Doc` element
     :type doc: ``None`` | :class:`.Doc`
+    :param streaming: if True, process the document one block at a time
+     (default is False). Ignored if ``doc`` is not ``None``, or if
+     a function sets ``whole_document = True``.
+    :type streaming: :class:`bool`
+    :param fused: if True, apply the actions in a single walk
+     (default is False)
+    :type fused: :class:`bool`
+    :param lazy: if True, load the document with ``lazy=True`` (see
+     :func:`.load`), so the blocks that the actions don't modify are
+     written back without encoding them again (default is False).
+     Ignored if ``doc`` is not ``None``.
+    :type lazy: :class:`bool`
     :param \*kwargs: keyword arguments will be passed through to the *action*
      functions (so they can actually receive more than just two arguments
      (*element* and *doc*)
     """
 
+    actions = list(actions)
+    if streaming:
+        functions = actions + [prepare, finalize]
+        streaming = not any(getattr(f, 'whole_document', False)
+                            for f in functions)
+
+    actions = _prepare_actions(actions, fused, kwargs)
+
+    if streaming and doc is None:
+        return _run_filters_streaming(actions, prepare, finalize,
+                                      input_stream, output_stream)
+
     load_and_dump = (doc is None)
 
     if load_and_dump:
-        doc = load(input_stream=input_stream)
+        doc = load(input_stream=input_stream, lazy=lazy)
 
     if prepare is not None:
         prepare(doc)
 
     for action in actions:
-        if kwargs:
-            action = partial(action, **kwargs)
         doc = doc.walk(action, doc)
 
     if finalize is not None:
@@ -252,6 +374,117 @@ def run_filters(actions,
         return(doc)
 
 
+def _prepare_actions(actions, fused, kwargs):
+    """
+    Pass the keyword arguments to the actions and, if fused is True,
+    combine the consecutive actions that can share a walk
+    """
+    ans = []
+    group = []
+    for action in actions:
+        sequential = getattr(action, 'sequential', False)
+        if kwargs:
+            action = partial(action, **kwargs)
+        if not fused:
+            ans.append(action)
+        elif sequential:
+            if group:
+                ans.append(_fuse_actions(group))
+                group = []
+            ans.append(action)
+        else:
+            group.append(action)
+    if group:
+        ans.append(_fuse_actions(group))
+    return ans
+
+
+def _fuse_actions(actions):
+    if len(actions) == 1:
+        return actions[0]
+    return partial(_apply_actions, actions)
+
+
+def _apply_actions(actions, elem, doc):
+    """
+    Apply several actions to an element, with the same return values
+    as a single action (see run_filters)
+    """
+    original = elem
+    for i, action in enumerate(actions):
+        altered = action(elem, doc)
+        if altered is None:
+            continue
+        elif type(altered) == list:
+            # The remaining actions are applied to each item
+            ans = []
+            for item in altered:
+                item_altered = _apply_actions(actions[i + 1:], item, doc)
+                if item_altered is None:
+                    ans.append(item)
+                elif type(item_altered) == list:
+                    ans.extend(item_altered)
+                else:
+                    ans.append(item_altered)
+            return ans
+        else:
+            elem = altered
+    return None if elem is original else elem
+
+
+def _run_filters_streaming(actions, prepare, finalize,
+                           input_stream, output_stream):
+    doc, blocks = load_blocks(input_stream=input_stream)
+
+    if prepare is not None:
+        prepare(doc)
+
+    # Same as doc.walk() but without the blocks
+    for action in actions:
+        doc.metadata = doc.metadata.walk(action, doc)
+
+    writer = _JSONWriter(_get_output_stream(output_stream), get_codec())
+    with _json_api(doc.api_version):
+        head, tail = _doc_json_frame(doc, writer.codec)
+    writer.write(head)
+
+    sep = ''
+    for block in blocks:
+        items = _filter_block(block, actions, doc)
+        with _json_api(doc.api_version):
+            writer.write_items(items, sep)
+        sep = sep or (',' if items else '')
+
+    for action in actions:
+        action(doc, doc)
+
+    if finalize is not None:
+        finalize(doc)
+
+    writer.write(tail)
+    writer.flush()
+
+
+def _filter_block(block, actions, doc):
+    """
+    Apply all the actions to a top-level block, which is temporarily made
+    the only content of the document; return the list of resulting blocks
+    """
+    items = [block]
+    for action in actions:
+        ans = []
+        for item in items:
+            doc.content.append(item)
+            altered = doc.content[0].walk(action, doc)  # Sets .parent
+            del doc.content[:]
+            if isinstance(altered, list):
+                ans.extend(altered)
+            else:
+                ans.append(altered)
+        items = ans
+    return items
+
+
 def run_filter(action, *args, **kwargs):
     """
      Wapper for :func:`.run_filters`
@@ -263,6 +496,275 @@ def run_filter(action, *args, **kwargs):
     return run_filters([action], *args, **kwargs)
 
 
+# ---------------------------
+# JSON output
+# ---------------------------
+
+def _get_output_stream(output_stream):
+    if output_stream is None:
+        sys.stdout = codecs.getwriter("utf-8")(sys.stdout.detach())
+        output_stream = sys.stdout
+    return output_stream
+
+
+@contextmanager
+def _json_api(api_version):
+    """
+    Switch to legacy JSON output if api_version is None
+    (e.g. {'t': 'Space', 'c': []} instead of {'t': 'Space'})
+    """
+
+    if api_version is not None:
+        yield
+        return
+
+    # Switch .to_json() to legacy
+    Citation.backup = Citation.to_json
+    Citation.to_json = Citation.to_json_legacy
+
+    # Switch ._slots_to_json() to legacy
+    for E in [Table, OrderedList, Quoted, Math]:
+        E.backup = E._slots_to_json
+        E._slots_to_json = E._slots_to_json_legacy
+
+    # Switch .to_json() to method of base class
+    for E in EMPTY_ELEMENTS:
+        E.backup = E.to_json
+        E.to_json = Element.to_json
+
+    try:
+        yield
+    finally:
+        # Undo legacy changes
+        Citation.to_json = Citation.backup
+        for E in [Table, OrderedList, Quoted, Math]:
+            E._slots_to_json = E.backup
+        for E in EMPTY_ELEMENTS:
+            E.to_json = E.backup
+
+
+def _cached_json(item):
+    """
+    Return the JSON text an item was loaded from, if it was not decoded
+    or modified since, or else None
+    """
+    if type(item) is RawJSON:
+        return item.text  # Not decoded, so write it back as it was
+    cache = getattr(item, '_cache', None)
+    return cache.get('json') if cache else None  # Not modified
+
+
+def _doc_json_frame(doc, codec):
+    """
+    Return the JSON text that goes before and after the list of blocks
+    (same output as Doc.to_json)
+    """
+    items = []
+    for key, value in doc.metadata.content.dict.items():
+        text = _cached_json(value)
+        if text is None:
+            text = codec.dumps(value)
+        items.append(codec.dumps(key) + ':' + text)
+    meta = '{' + ','.join(items) + '}'
+    if doc.api_version is None:
+        return '[{"unMeta":' + meta + '},[', ']]'
+    else:
+        api_version = codec.dumps(doc.api_version)
+        head = '{"pandoc-api-version":' + api_version + \
+               ',"meta":' + meta + ',"blocks":['
+        return head, ']}'
+
+
+class _JSONWriter(object):
+    """
+    Write JSON text to a stream in large chunks, encoding a list of
+    elements a batch at a time so only the JSON of the current batch
+    has to fit in memory
+    """
+
+    buffer_size = 2**16
+    batch_size = 64
+
+    def __init__(self, output_stream, codec):
+        self.output_stream = output_stream
+        self.codec = codec
+        self.chunks = []
+        self.size = 0
+
+    def write(self, text):
+        self.chunks.append(text)
+        self.size += len(text)
+        if self.size >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.chunks:
+            self.output_stream.write(''.join(self.chunks))
+            self.chunks = []
+            self.size = 0
+
+    def write_items(self, items, sep=''):
+        """
+        Write the elements of a list separated by commas (but without
+        the enclosing brackets); *sep* goes before the first one
+        """
+        batch = []
+        for item in items:
+            text = _cached_json(item)
+            if text is not None:
+                sep = self.write_batch(batch, sep)
+                batch = []
+                if sep:
+                    self.write(sep)
+                self.write(text)
+                sep = ','
+            else:
+                batch.append(item)
+                if len(batch) == self.batch_size:
+                    sep = self.write_batch(batch, sep)
+                    batch = []
+        self.write_batch(batch, sep)
+
+    def write_batch(self, batch, sep):
+        if not batch:
+            return sep
+        if sep:
+            self.write(sep)
+        self.write(self.codec.dumps(batch)[1:-1])
+        return ','
+
+
+# ---------------------------
+# Incremental JSON reader
+# ---------------------------
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class _JSONReader(object):
+    """
+    Decode a JSON text stream one value at a time, reading the stream in
+    chunks so only the current value has to fit in memory
+    """
+
+    chunk_size = 2 ** 20
+
+    def __init__(self, input_stream, object_pairs_hook):
+        self.input_stream = input_stream
+        self.decoder = json.JSONDecoder(object_pairs_hook=object_pairs_hook)
+        self.scanner = json.JSONDecoder()  # Only used to find where values end
+        self.buffer = ''
+        self.pos = 0
+
+    def read(self, size):
+        """Append more text to the buffer; return False at the end"""
+        chunk = self.input_stream.read(size)
+        if not chunk:
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Skip whitespace and return the next character ('' at the end)"""
+        if self.pos < len(self.buffer):
+            c = self.buffer[self.pos]
+            if c not in ' \t\n\r':
+                return c  # Fast path
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.read(self.chunk_size):
+                return ''
+
+    def expect(self, chars):
+        """Consume the next character, which must be one of chars"""
+        c = self.peek()
+        if c not in chars or (c == '' and chars):
+            msg = 'Expecting one of "{}" but found "{}" (char {})'
+            raise ValueError(msg.format(chars, c, self.pos))
+        self.pos += 1
+        return c
+
+    def value(self, raw=False, cache=False):
+        """
+        Decode the next JSON value; if raw is True, return its text
+        wrapped in a RawJSON placeholder instead, and if cache is True,
+        keep the text in the decoded element
+        """
+        decoder = self.scanner if raw else self.decoder
+        self.peek()
+        while True:
+            try:
+                obj, end = decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # The value might be incomplete; if so, double the buffer
+                size = max(self.chunk_size, len(self.buffer) - self.pos)
+                if not self.read(size):
+                    raise
+            else:
+                if raw:
+                    obj = RawJSON(self.buffer[self.pos:end], self.decoder)
+                elif cache and isinstance(obj, Element):
+                    _set_cache(obj, {'json': self.buffer[self.pos:end]})
+                self.pos = end
+                return obj
+
+
+def _read_object(reader, raw=False, cache=False):
+    """
+    Read a JSON object into an OrderedDict, decoding its values one at a
+    time (see _JSONReader.value)
+    """
+    ans = OrderedDict()
+    reader.expect('{')
+    if reader.peek() == '}':
+        reader.expect('}')
+        return ans
+    while True:
+        key = reader.value()
+        reader.expect(':')
+        ans[key] = reader.value(raw, cache)
+        if reader.expect(',}') == '}':
+            return ans
+
+
+def _iter_array(reader, raw=False, cache=False):
+    reader.expect('[')
+    if reader.peek() == ']':
+        reader.expect(']')
+        return
+    while True:
+        yield reader.value(raw, cache)
+        if reader.expect(',]') == ']':
+            return
+
+
+def _iter_blocks(reader, raw=False, cache=False):
+    yield from _iter_array(reader, raw, cache)
+
+    # Validate the rest of the document
+    while reader.expect(',}') == ',':
+        key = reader.value()
+        raise ValueError('unexpected key in document: {}'.format(key))
+    reader.expect('')
+
+
+def _iter_legacy_blocks(reader, raw=False, cache=False):
+    yield from _iter_array(reader, raw, cache)
+    reader.expect(']')
+    reader.expect('')
+
+
+def _new_doc(metadata, api_version, format, trusted):
+    if not trusted:
+        return Doc(metadata=metadata, format=format, api_version=api_version)
+    if not isinstance(metadata, MetaMap):
+        metadata = _trusted_meta_map(metadata)
+    return _trusted_doc([], metadata, api_version, format)
+
+
 def load_reader_options():
     """
     Retrieve Pandoc Reader options from the environment
@@ -0,0 +1,296 @@
+"""
+Backends used to run Pandoc (see :func:`.run_pandoc` and :func:`.convert_text`)
+
+By default, every conversion starts a new ``pandoc`` process, which takes
+50 to 150ms before any work is done. Filters that call
+:func:`.convert_text` many times per document can instead keep a
+long-lived Pandoc running in server mode (Pandoc 3.0 or later)
+and send it one request per conversion:
+
+    >>> from panflute.runners import set_runner
+    >>> set_runner('server')
+
+Conversions that the server cannot do (such as the ones that need
+filters or files) are still done by starting a process.
+"""
+
+# ---------------------------
+# Imports
+# ---------------------------
+
+import os
+import json
+import time
+import socket
+import weakref
+import threading
+from http.client import HTTPConnection
+from shutil import which
+from subprocess import Popen, PIPE, DEVNULL
+
+
+# ---------------------------
+# Backends
+# ---------------------------
+
+class PandocProcess(object):
+    """
+    Start a new ``pandoc`` process for each conversion.
+
+    :param pandoc_path: path to the Pandoc executable
+        (by default, the ``pandoc`` found in the ``PATH``)
+    :param max_workers: maximum number of conversions that run at the
+        same time (by default, the number of CPUs)
+    """
+
+    name = 'process'
+
+    def __init__(self, pandoc_path=None, max_workers=None):
+        self.pandoc_path = pandoc_path
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.slots = threading.BoundedSemaphore(self.max_workers)
+        self._version = None
+
+    def get_path(self):
+        if self.pandoc_path is None:
+            self.pandoc_path = which('pandoc')
+        if self.pandoc_path is None or not os.path.exists(self.pandoc_path):
+            self.pandoc_path = None
+            raise OSError("Path to pandoc executable does not exists")
+        return self.pandoc_path
+
+    def version(self):
+        """Return the first line of ``pandoc --version``"""
+        if self._version is None:
+            out = PandocProcess.run(self, '', ['--version'])
+            self._version = out.splitlines()[0] if out else ''
+        return self._version
+
+    def run(self, text, args):
+        """
+        Call Pandoc with the input text and the command line arguments,
+        and return its output
+        """
+        args = [self.get_path()] + args
+        with self.slots:
+            proc = Popen(args, stdin=PIPE, stdout=PIPE, stderr=PIPE)
+            out, err = proc.communicate(input=text.encode('utf-8'))
+        if err:
+            debug(err.decode('utf-8'))
+        if proc.returncode != 0:
+            raise IOError('')
+        return out.decode('utf-8')
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class PandocServer(PandocProcess):
+    """
+    Send the conversions to a ``pandoc server`` that is started on first
+    use and stopped when the backend is closed (or Python exits).
+
+    Pandoc versions without server mode, and command line arguments that
+    the server doesn't support, fall back to one process per conversion.
+
+    :param pandoc_path: path to the Pandoc executable
+    :param max_workers: maximum number of conversions that run at the
+        same time (the server converts them in parallel)
+    :param timeout: seconds after which the server gives up on a conversion
+    """
+
+    name = 'server'
+
+    def __init__(self, pandoc_path=None, max_workers=None, timeout=60):
+        super().__init__(pandoc_path, max_workers)
+        self.timeout = timeout
+        self.available = True  # Until the server fails to start
+        self.port = None
+        self.proc = None
+        self.lock = threading.Lock()
+        self._finalizer = None
+
+    def run(self, text, args):
+        params = server_params(args)
+        if params is None or not self.available or not self.start():
+            return super().run(text, args)
+        params['text'] = text
+        body = json.dumps(params).encode('utf-8')
+        headers = {'Content-Type': 'application/json',
+                   'Accept': 'application/json'}
+
+        with self.slots:
+            conn = HTTPConnection('127.0.0.1', self.port,
+                                  timeout=self.timeout + 10)
+            try:
+                conn.request('POST', '/', body, headers)
+                response = conn.getresponse()
+                status, data = response.status, response.read()
+            finally:
+                conn.close()
+
+        data = data.decode('utf-8')
+        if status != 200:
+            raise IOError(data)
+        ans = json.loads(data)
+        if 'error' in ans:
+            raise IOError(ans['error'])
+        for message in ans.get('messages', []):
+            debug(json.dumps(message))
+        if ans.get('base64'):
+            raise IOError('Binary output formats are not supported')
+        return ans['output']
+
+    def start(self):
+        """
+        Start the server unless it is already running,
+        and return whether it is available
+        """
+        with self.lock:
+            if self.proc is not None and self.proc.poll() is None:
+                return True
+            self.port = free_port()
+            args = [self.get_path(), 'server', '--port={}'.format(self.port),
+                    '--timeout={}'.format(self.timeout)]
+            self.proc = Popen(args, stdin=DEVNULL, stdout=DEVNULL,
+                              stderr=DEVNULL)
+            self._finalizer = weakref.finalize(self, stop, self.proc)
+
+            # Wait until it accepts connections, or exits (older Pandocs
+            # take 'server' as the name of a missing input file)
+            deadline = time.monotonic() + 10
+            while self.proc.poll() is None and time.monotonic() < deadline:
+                try:
+                    socket.create_connection(('127.0.0.1', self.port),
+                                             timeout=1).close()
+                    return True
+                except OSError:
+                    time.sleep(0.02)
+
+            self.close()
+            self.available = False
+            return False
+
+    def close(self):
+        """Stop the server (it is started again if needed)"""
+        if self._finalizer is not None:
+            self._finalizer()
+            self._finalizer = None
+        self.proc = None
+
+
+# ---------------------------
+# Constants
+# ---------------------------
+
+RUNNERS = {
+    'process': PandocProcess,
+    'server': PandocServer}
+
+# Command line arguments that the server takes as JSON parameters
+SERVER_FLAGS = {
+    '--standalone': 'standalone',
+    '-s': 'standalone',
+    '--number-sections': 'number-sections',
+    '--table-of-contents': 'table-of-contents',
+    '--toc': 'table-of-contents',
+    '--reference-links': 'reference-links'}
+
+SERVER_OPTIONS = {
+    '--from': str,
+    '--to': str,
+    '--wrap': str,
+    '--columns': int,
+    '--tab-stop': int,
+    '--shift-heading-level-by': int}
+
+_default_runner = None
+
+
+# ---------------------------
+# Functions
+# ---------------------------
+
+def server_params(args):
+    """
+    Translate command line arguments into the parameters of a server
+    request, or return None if some of them are not supported
+    """
+    params = {}
+    for arg in args:
+        if arg in SERVER_FLAGS:
+            params[SERVER_FLAGS[arg]] = True
+            continue
+        name, sep, value = arg.partition('=')
+        if not sep or name not in SERVER_OPTIONS:
+            return None
+        try:
+            params[name[2:]] = SERVER_OPTIONS[name](value)
+        except ValueError:
+            return None
+    return params
+
+
+def debug(*args):
+    from .tools import debug  # The tools module imports this one
+    debug(*args)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def stop(proc):
+    if proc.poll() is None:
+        proc.terminate()
+        try:
+            proc.wait(timeout=5)
+        except Exception:
+            proc.kill()
+
+
+def get_runner(name=None, **kwargs):
+    """
+    Return a backend that runs Pandoc.
+
+    :param name: 'process' or 'server'. If ``None`` (the default), return
+        the backend set by :func:`set_runner`, or else 'process'.
+    :param kwargs: options of the backend (e.g. ``max_workers``), see
+        :class:`PandocProcess` and :class:`PandocServer`
+    :rtype: :class:`PandocProcess`
+    """
+    global _default_runner
+
+    if name is not None:
+        if name not in RUNNERS:
+            raise ValueError('unknown Pandoc backend: {}'.format(name))
+        return RUNNERS[name](**kwargs)
+
+    if _default_runner is None:
+        _default_runner = PandocProcess()
+    return _default_runner
+
+
+def set_runner(name=None, **kwargs):
+    """
+    Set the backend used by :func:`.run_pandoc` and :func:`.convert_text`
+    (``None`` restores the default, one process per conversion).
+
+    :param name: 'process', 'server', a backend, or ``None``
+    :param kwargs: options of the backend, as in :func:`get_runner`
+    """
+    global _default_runner
+    if _default_runner is not None:
+        _default_runner.close()
+    if name is None or isinstance(name, PandocProcess):
+        _default_runner = name
+    else:
+        _default_runner = get_runner(name, **kwargs)
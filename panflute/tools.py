@@ -7,21 +7,24 @@ Useful (but not essential) functions for writing panflute filters
 # Imports
 # ---------------------------
 
-from .base import Element
+from .base import Element, _iter_children, _set_cache
 from .elements import *
 from .io import dump
+from .codec import get_codec
+from .runners import get_runner
+from .cache import get_cache
+from .utils import encode_dict
 
 import io
 import os
 import re
 import sys
-import json
 import yaml
 import shlex
 
-from shutil import which
 from subprocess import Popen, PIPE
 from functools import partial
+from uuid import uuid4
 
 
 # ---------------------------
@@ -166,7 +169,7 @@ def debug(*args, **kwargs):
 # Functions that extract content
 # ---------------------------
 
-def stringify(element, newlines=True):
+def stringify(element, newlines=True, cache=False):
     """
     Return the raw text version of an elements (and its children element).
 
@@ -179,36 +182,90 @@ def stringify(element, newlines=True):
         >>> stringify(para)
         'Hello world! Bye!\n\n'
 
+    With ``cache=True``, the text is kept in the element, so calling
+    stringify again on it (or on an ancestor, also with ``cache=True``)
+    does not visit its children again. The text is discarded as soon as
+    the element or any of its children is modified (through the
+    attributes and containers of the elements), or when one of its
+    children is added to another element. Children shared this way
+    (as in ``Plain(*header.content)``) then only notify their new parent,
+    so the text cached again in the old one can become stale.
+
     :param newlines: add a new line after a paragraph (default True)
     :type newlines: :class:`bool`
+    :param cache: reuse and keep the text of the element (default False)
+    :type cache: :class:`bool`
     :rtype: :class:`str`
     """
+    if cache:
+        key = 'text' if newlines else 'text-no-newlines'
+        inner = _stringify_children(element, newlines, key)
+    else:
+        inner = _stringify_children(element, newlines)
+    return inner + _stringify_one(element, element.parent, newlines)
 
-    def attach_str(e, doc, answer):
-        if hasattr(e, 'text'):
-            ans = e.text
-        elif isinstance(e, HorizontalSpaces):
-            ans = ' '
-        elif isinstance(e, VerticalSpaces) and newlines:
-            ans = '\n\n'
-        elif type(e) == Citation:
-            ans = ''
-        else:
-            ans = ''
-
-        # Add quotes around the contents of Quoted()
-        if type(e.parent) == Quoted:
-            if e.index == 0:
-                ans = '"' + ans
-            if e.index == len(e.container) - 1:
-                ans += '"'
-        
-        answer.append(ans)
 
+def _stringify_children(element, newlines, key=None):
+    """
+    Text of the children of an element; if *key* is given, use and keep
+    the text cached under that key in element._cache
+    """
+    if key is not None:
+        data = element._cache
+        if data is not None and key in data:
+            return data[key]
+
+    # Same output as walking the element with an action that appends the
+    # text of each element, but read-only: the stack holds the elements
+    # being visited and the iterators over their children
     answer = []
-    f = partial(attach_str, answer=answer)
-    element.walk(f)
-    return ''.join(answer)
+    stack = [(element, _iter_children(element, None))]
+    while stack:
+        elem, children = stack[-1]
+        for child in children:
+            if child._children:
+                data = child._cache if key is not None else None
+                if data is None or key not in data:
+                    stack.append((child, _iter_children(child, None)))
+                    break
+                answer.append(data[key])
+            # Shortcut for elements without children (Str, Space)
+            # or whose text is cached
+            answer.append(_stringify_one(child, elem, newlines))
+        else:
+            stack.pop()
+            if stack:
+                answer.append(_stringify_one(elem, stack[-1][0], newlines))
+
+    text = ''.join(answer)
+    if key is not None:
+        # The cache goes away with the JSON text of the element when it
+        # is modified (see Element._invalidate)
+        if element._cache is None:
+            _set_cache(element, {})
+        element._cache[key] = text
+    return text
+
+
+def _stringify_one(e, parent, newlines):
+    """Text of the element itself, without the one of its children"""
+    if hasattr(e, 'text'):
+        ans = e.text
+    elif isinstance(e, HorizontalSpaces):
+        ans = ' '
+    elif isinstance(e, VerticalSpaces) and newlines:
+        ans = '\n\n'
+    else:
+        ans = ''
+
+    # Add quotes around the contents of Quoted()
+    if type(parent) == Quoted:
+        items = parent.content
+        if items[0] is e:
+            ans = '"' + ans
+        if items[-1] is e:
+            ans += '"'
+    return ans
 
 
 def _get_metadata(self, key='', default=None, builtin=True):
@@ -254,21 +311,50 @@ def _get_metadata(self, key='', default=None, builtin=True):
 
 
 def meta2builtin(meta):
+    return _copy_builtin(_meta2builtin(meta))
+
+
+def _meta2builtin(meta):
+    """
+    Same as meta2builtin(), but the result is cached in the element until
+    it or its children are modified (see Element._invalidate), so the
+    dicts and lists returned are shared and must not be modified
+    """
+    cache = meta._cache if isinstance(meta, Element) else None
+    if cache is not None and 'builtin' in cache:
+        return cache['builtin']
+
     if isinstance(meta, MetaBool):
-        return meta.boolean
+        ans = meta.boolean
     elif isinstance(meta, MetaString):
-        return meta.text
+        ans = meta.text
     elif isinstance(meta, MetaList):
-        return [meta2builtin(v) for v in meta.content.list]
+        ans = [_meta2builtin(v) for v in meta.content.list]
     elif isinstance(meta, MetaMap):
-        return OrderedDict((k, meta2builtin(v)) for (k, v)
-                           in meta.content.dict.items())
+        ans = OrderedDict((k, _meta2builtin(v)) for (k, v)
+                          in meta.content.items())
     elif isinstance(meta, (MetaInlines, MetaBlocks)):
-        return stringify(meta)
+        ans = stringify(meta)
     else:
         debug("MISSING", type(meta))
         return meta
 
+    if cache is None:
+        cache = {}
+        _set_cache(meta, cache)
+    cache['builtin'] = ans
+    return ans
+
+
+def _copy_builtin(value):
+    """Copy the dicts and lists of a result of _meta2builtin()"""
+    if type(value) == OrderedDict:
+        return OrderedDict((k, _copy_builtin(v)) for (k, v) in value.items())
+    elif type(value) == list:
+        return [_copy_builtin(v) for v in value]
+    else:
+        return value
+
 
 # Bind the method
 Doc.get_metadata = _get_metadata
@@ -324,30 +410,24 @@ def run_pandoc(text='', args=None):
     """
     Low level function that calls Pandoc with (optionally)
     some input text and/or arguments
+
+    Pandoc is run by the backend set with
+    :func:`panflute.runners.set_runner` (by default, a new process
+    for each call).
     """
 
     if args is None:
         args = []
 
-    pandoc_path = which('pandoc')
-    if pandoc_path is None or not os.path.exists(pandoc_path):
-        raise OSError("Path to pandoc executable does not exists")
-
-    proc = Popen([pandoc_path] + args, stdin=PIPE, stdout=PIPE, stderr=PIPE)
-    out, err = proc.communicate(input=text.encode('utf-8'))
-    exitcode = proc.returncode
-    if err:
-        debug(err.decode('utf-8'))
-    if exitcode != 0:
-        raise IOError('')
-    return out.decode('utf-8')
+    return get_runner().run(text, args)
 
 
 def convert_text(text,
                  input_format='markdown',
                  output_format='panflute',
                  standalone=False,
-                 extra_args=None):
+                 extra_args=None,
+                 cache=None):
     """
     Convert formatted text (usually markdown) by calling Pandoc internally
 
@@ -380,6 +460,10 @@ def convert_text(text,
     :type standalone: :class:`bool`
     :param extra_args: extra arguments passed to Pandoc
     :type extra_args: :class:`list`
+    :param cache: where to look for the output before calling Pandoc,
+     and store it afterwards. ``None`` (the default) uses the cache set
+     with :func:`panflute.cache.set_cache`, if any, and ``False`` disables it
+    :type cache: :class:`.ConversionCache` | ``None`` | ``False``
     :rtype: :class:`list` | :class:`.Doc` | :class:`str`
 
     Note: for a more general solution,
@@ -395,16 +479,18 @@ def convert_text(text,
         #  (remember that Pandoc requires a matching api-version!)
         # Workaround: call Pandoc with empty text to get its api-version
         if not isinstance(text, Doc):
-            tmp_doc = convert_text('', standalone=True)
+            tmp_doc = convert_text('', standalone=True, cache=cache)
             api_version = tmp_doc.api_version
             if isinstance(text, Element):
                 text = [text]
-            text = Doc(*text, api_version=api_version)
-
-        # Dump the Doc into json
-        with io.StringIO() as f:
-            dump(text, f)
-            text = f.getvalue()
+            # Write the json without adding the elements to a new Doc,
+            # so they stay where they are
+            text = _blocks_json(list(text), api_version)
+        else:
+            # Dump the Doc into json
+            with io.StringIO() as f:
+                dump(text, f)
+                text = f.getvalue()
 
     in_fmt = 'json' if input_format == 'panflute' else input_format
     out_fmt = 'json' if output_format == 'panflute' else output_format
@@ -415,10 +501,26 @@ def convert_text(text,
     if standalone:
         extra_args.append('--standalone')
 
-    out = inner_convert_text(text, in_fmt, out_fmt, extra_args)
+    cache = _get_cache(cache)
+    if cache is None:
+        out = inner_convert_text(text, in_fmt, out_fmt, extra_args)
+    else:
+        key = cache.key(text, in_fmt, out_fmt, extra_args,
+                        get_runner().version())
+        out = cache.get(key)
+        if out is None:
+            out = inner_convert_text(text, in_fmt, out_fmt, extra_args)
+            cache.set(key, out)
+
+    return _decode_output(out, output_format, standalone)
+
 
+def _decode_output(out, output_format, standalone):
+    """Build the result of convert_text() from the output of Pandoc"""
     if output_format == 'panflute':
-        out = json.loads(out, object_pairs_hook=from_json)
+        # Pandoc output is valid, so we can skip the type checks
+        hook = partial(from_json, trusted=True)
+        out = get_codec().loads(out, object_pairs_hook=hook)
 
         if standalone:
             if not isinstance(out, Doc):  # Pandoc 1.7.2 and earlier
@@ -426,13 +528,221 @@ def convert_text(text,
                 out = Doc(*items, metadata=metadata)
         else:
             if isinstance(out, Doc):  # Pandoc 1.8 and later
-                out = out.content.list
+                out = _take_content(out)
             else:
                 out = out[1]  # Pandoc 1.7.2 and earlier
 
     return out
 
 
+def convert_text_many(texts,
+                      input_format='markdown',
+                      output_format='panflute',
+                      extra_args=None,
+                      cache=None):
+    """
+    Convert several fragments of formatted text, as
+    :func:`convert_text` would do for each of them,
+    but calling Pandoc only once or twice instead of once per fragment.
+
+    The fragments are joined into a single document, separated by
+    paragraphs with a unique marker, and the output is split back at
+    those markers. If the markers don't survive the conversion (e.g. the
+    fragment opens a code block that is never closed), each fragment is
+    converted on its own instead. Fragments of panflute elements that
+    are converted into panflute elements are instead wrapped in Divs
+    with unique identifiers; the elements given are only read, and stay
+    where they are.
+
+    Example:
+
+        >>> from panflute import *
+        >>> convert_text_many(['*a*', 'b'])
+        [[Para(Emph(Str(a)))], [Para(Str(b))]]
+        >>> convert_text_many(['*a*', 'b'], output_format='html')
+        ['<p><em>a</em></p>', '<p>b</p>']
+
+    Note: since text fragments are read as one document, they share
+    footnote and link reference definitions, and automatic header
+    identifiers are unique across all of them.
+
+    :param texts: fragments that will be converted
+    :type texts: :class:`list` of :class:`str` (or, when the input format
+     is 'panflute', of :class:`.Element` or lists of blocks)
+    :param input_format: format of the fragments, as in :func:`convert_text`
+    :param output_format: format of the output, as in :func:`convert_text`
+    :param extra_args: extra arguments passed to Pandoc
+    :type extra_args: :class:`list`
+    :param cache: as in :func:`convert_text`; only the fragments that are
+     not cached are converted. The outputs are kept apart from the ones
+     of :func:`convert_text`, since they can differ
+    :rtype: :class:`list` with one result (a :class:`list` of
+     :class:`.Block` elements or a :class:`str`) per fragment
+    """
+
+    texts = list(texts)
+    extra_args = list(extra_args or [])
+    cache = _get_cache(cache)
+
+    def one_by_one(texts, input_format):
+        return [convert_text(text, input_format, output_format,
+                             extra_args=list(extra_args),
+                             cache=cache or False)
+                for text in texts]
+
+    if len(texts) < 2:
+        return one_by_one(texts, input_format)
+
+    if cache is not None and input_format != 'panflute':
+        return _convert_text_many_cached(texts, input_format, output_format,
+                                         extra_args, cache)
+
+    marker = 'panflute{}'.format(uuid4().hex)
+
+    # Read all the fragments at once
+    if input_format == 'panflute':
+        parts = [[text] if isinstance(text, Element) else list(text)
+                 for text in texts]
+        api_version = convert_text('', standalone=True,
+                                   cache=cache or False).api_version
+    else:
+        joined = '\n\n{}\n\n'.format(marker).join(texts)
+        doc = convert_text(joined, input_format, standalone=True,
+                           extra_args=list(extra_args), cache=False)
+        parts = _split_blocks(_take_content(doc), marker, len(texts))
+        if parts is None:
+            return one_by_one(texts, input_format)
+        if output_format == 'panflute':
+            return parts
+        api_version = doc.api_version
+
+    # Footnotes would be written at the end of the whole document
+    if output_format != 'panflute' and \
+            any(True for part in parts for x in part for e in x.iter(Note)):
+        return one_by_one(parts, 'panflute')
+
+    # Write all the fragments at once (as json, so the elements given
+    # are not added to a new Doc)
+    blocks = []
+    if output_format == 'panflute':
+        ids = ['{}-{}'.format(marker, i) for i in range(len(parts))]
+        for identifier, part in zip(ids, parts):
+            blocks.append(encode_dict('Div', [[identifier, [], []], part]))
+    else:
+        for part in parts:
+            blocks.extend(part)
+            blocks.append(Para(Str(marker)))
+        blocks.pop()
+    out = convert_text(_blocks_json(blocks, api_version), 'json',
+                       output_format, extra_args=list(extra_args),
+                       cache=False)
+
+    if output_format == 'panflute':
+        ans = _split_divs(out, ids)
+    else:
+        ans = _split_lines(out, marker, len(parts))
+    return one_by_one(parts, 'panflute') if ans is None else ans
+
+
+def _convert_text_many_cached(texts, input_format, output_format,
+                              extra_args, cache):
+    """
+    Take the fragments that are cached from the cache and convert the
+    others with convert_text_many. The keys are not the ones of
+    convert_text, as fragments converted together can give another output
+    (e.g. shared link references or unique header identifiers)
+    """
+    out_fmt = 'json' if output_format == 'panflute' else output_format
+    version = get_runner().version()
+    keys = [cache.key(text, input_format, out_fmt, extra_args, version,
+                      batched=True)
+            for text in texts]
+    ans = [cache.get(key) for key in keys]
+    missing = [i for i, out in enumerate(ans) if out is None]
+
+    for i, out in enumerate(ans):
+        if out is not None:
+            ans[i] = _decode_output(out, output_format, False)
+
+    if missing:
+        new = convert_text_many([texts[i] for i in missing], input_format,
+                                output_format, extra_args, cache=False)
+        if output_format == 'panflute':
+            # Stored as Pandoc would have written them
+            api_version = convert_text('', standalone=True,
+                                       cache=cache).api_version
+        for i, out in zip(missing, new):
+            ans[i] = out
+            if output_format == 'panflute':
+                out = _blocks_json(out, api_version)
+            cache.set(keys[i], out)
+
+    return ans
+
+
+def _blocks_json(blocks, api_version):
+    """JSON of a document with these blocks and no metadata"""
+    if api_version is None:
+        obj = [{'unMeta': {}}, blocks]
+    else:
+        obj = OrderedDict([('pandoc-api-version', api_version),
+                           ('meta', {}), ('blocks', blocks)])
+    return get_codec().dumps(obj)
+
+
+def _get_cache(cache):
+    """Return the cache to use, given the cache argument of convert_text"""
+    return get_cache() if cache is None else (cache or None)
+
+
+def _split_blocks(blocks, marker, count):
+    """Split a list of blocks at the paragraphs with the marker"""
+    ans = [[]]
+    for block in blocks:
+        if type(block) in (Para, Plain) and len(block.content) == 1 and \
+                type(block.content[0]) is Str and \
+                block.content[0].text == marker:
+            ans.append([])
+        else:
+            ans[-1].append(block)
+    return ans if len(ans) == count else None
+
+
+def _split_divs(blocks, ids):
+    """Take the blocks out of the Divs with these identifiers"""
+    if len(blocks) != len(ids) or \
+            any(type(block) is not Div or block.identifier != identifier
+                for block, identifier in zip(blocks, ids)):
+        return None
+    return [_take_content(div) for div in blocks]
+
+
+def _take_content(elem):
+    """
+    Take the blocks out of a temporary element, so they are returned
+    without a parent (as new elements)
+    """
+    blocks = elem.content.list[:]
+    del elem.content[:]
+    for block in blocks:
+        block.parent = None
+        block.location = None
+    return blocks
+
+
+def _split_lines(text, marker, count):
+    """Split the output text at the lines with the marker"""
+    ans = [[]]
+    for line in text.split('\n'):
+        if marker in line:
+            ans.append([])
+        else:
+            ans[-1].append(line)
+    if len(ans) != count:
+        return None
+    return ['\n'.join(lines).strip('\n') for lines in ans]
+
+
 def inner_convert_text(text, input_format, output_format, extra_args):
     # like convert_text(), but does not support 'panflute' input/output
     from_arg = '--from={}'.format(input_format)
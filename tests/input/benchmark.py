@@ -0,0 +1,362 @@
+"""
+Benchmark panflute on the documents of the tests/input folder
+
+Usage (from the root of the repo):
+
+    python tests/input/benchmark.py
+"""
+
+import io
+import os
+import timeit
+from functools import partial
+from itertools import chain
+
+import panflute as pf
+
+
+# ---------------------------
+# Setup
+# ---------------------------
+
+folder = os.path.dirname(os.path.abspath(__file__))
+corpora = ['awesome-c', 'barcode', 'heavy_metadata', 'portugal']
+
+
+def read(corpus):
+    fn = os.path.join(folder, corpus, 'benchmark.json')
+    with open(fn, encoding='utf-8') as f:
+        return f.read()
+
+
+def best(stmt, repeat=5):
+    return min(timeit.repeat(stmt, number=1, repeat=repeat))
+
+
+def compare(name, t1, t2):
+    print(' - {:<16}{:8.4f}{:8.4f}  ({:.1f}x)'.format(name, t1, t2, t1 / t2))
+
+
+# ---------------------------
+# Benchmarks
+# ---------------------------
+
+def bench_load():
+    print('\nLoading JSON (seconds; validated vs trusted):')
+    for corpus in corpora:
+        raw = read(corpus)
+        t1 = best(lambda: pf.load(io.StringIO(raw)))
+        t2 = best(lambda: pf.load(io.StringIO(raw), trusted=True))
+        compare(corpus, t1, t2)
+
+
+def bench_passthrough():
+    print('\nLoad and dump without changes (seconds; eager vs lazy):')
+    for corpus in corpora:
+        raw = read(corpus)
+
+        def run(lazy):
+            doc = pf.load(io.StringIO(raw), trusted=True, lazy=lazy)
+            pf.dump(doc, io.StringIO())
+
+        t1 = best(lambda: run(False))
+        t2 = best(lambda: run(True))
+        compare(corpus, t1, t2)
+
+
+def bench_noop_filter():
+    def noop(elem, doc):
+        pass
+
+    print('\nFilter that changes nothing (seconds; load+walk / dump):')
+    for corpus in corpora:
+        raw = read(corpus)
+        doc = pf.load(io.StringIO(raw), lazy=True)
+        doc.walk(noop)
+        t1 = best(lambda: pf.load(io.StringIO(raw), lazy=True).walk(noop))
+        t2 = best(lambda: pf.dump(doc, io.StringIO()))
+        print(' - {:<16}{:8.4f}{:8.4f}'.format(corpus, t1, t2))
+
+
+def recursive_walk(self, action, doc):
+    """Element.walk() as it was before the explicit-stack version"""
+    for child in self._children:
+        obj = getattr(self, child)
+        if isinstance(obj, pf.Element):
+            ans = recursive_walk(obj, action, doc)
+        elif isinstance(obj, pf.ListContainer):
+            ans = (recursive_walk(item, action, doc) for item in obj)
+            ans = ((item,) if type(item) is not list else item for item in ans)
+            ans = list(chain.from_iterable(ans))
+        elif isinstance(obj, pf.DictContainer):
+            ans = [(k, recursive_walk(v, action, doc)) for k, v in obj.items()]
+            ans = [(k, v) for k, v in ans if v != []]
+        elif obj is None:
+            ans = None
+        else:
+            raise TypeError(type(obj))
+        setattr(self, child, ans)
+    altered = action(self, doc)
+    return self if altered is None else altered
+
+
+def bench_walk():
+    print('\nWalk (seconds; recursive vs explicit stack):')
+
+    def action(elem, doc):
+        pass
+
+    def upper(elem, doc):
+        if isinstance(elem, pf.Str):
+            return pf.Str(elem.text.upper())
+
+    def dumps(doc):
+        with io.StringIO() as f:
+            pf.dump(doc, f)
+            return f.getvalue()
+
+    for corpus in corpora:
+        raw = read(corpus)
+        doc = pf.load(io.StringIO(raw))
+        ref = pf.load(io.StringIO(raw))
+        assert dumps(recursive_walk(ref, upper, ref)) == dumps(doc.walk(upper))
+
+        doc = pf.load(io.StringIO(raw))
+        t1 = best(lambda: recursive_walk(doc, action, doc))
+        t2 = best(lambda: doc.walk(action, doc))
+        compare(corpus, t1, t2)
+
+
+def bench_dispatch():
+    print('\nWalk looking for CodeBlocks (action calls, seconds; '
+          'function vs dict vs dict on a lazy doc):')
+    calls = [0]
+
+    def count(elem, doc):
+        calls[0] += 1
+
+    def action(elem, doc):
+        calls[0] += 1
+        if isinstance(elem, pf.CodeBlock):
+            pass
+
+    for corpus in corpora:
+        raw = read(corpus)
+        doc = pf.load(io.StringIO(raw))
+        ans = []
+        for run in (lambda: doc.walk(action),
+                    lambda: doc.walk({pf.CodeBlock: count}),
+                    lambda: pf.load(io.StringIO(raw), lazy=True).walk(
+                        {pf.CodeBlock: count})):
+            calls[0] = 0
+            run()
+            ans.extend([calls[0], best(run)])
+        row = '{:8}{:8.4f}' * 3
+        print((' - {:<16}' + row).format(corpus, *ans))
+
+
+def bench_fused():
+    print('\nThree filters (seconds; one walk each vs fused):')
+
+    def upper_str(elem, doc):
+        if isinstance(elem, pf.Str):
+            elem.text = elem.text.upper()
+
+    def drop_code(elem, doc):
+        if isinstance(elem, pf.CodeBlock):
+            return []
+
+    def emph_to_strong(elem, doc):
+        if isinstance(elem, pf.Emph):
+            return pf.Strong(*elem.content)
+
+    actions = [upper_str, drop_code, emph_to_strong]
+    for corpus in corpora:
+        doc = pf.load(io.StringIO(read(corpus)))
+        t1 = best(lambda: pf.run_filters(actions, doc=doc))
+        t2 = best(lambda: pf.run_filters(actions, doc=doc, fused=True))
+        compare(corpus, t1, t2)
+
+
+def bench_find():
+    print('\nFind the Headers (seconds; walk vs iter vs find_all) '
+          'and the first one (walk vs stopped top-down walk):')
+
+    def collect(elem, doc):
+        if isinstance(elem, pf.Header):
+            found.append(elem)
+
+    def first(elem, doc):
+        if isinstance(elem, pf.Header):
+            found.append(elem)
+            return pf.STOP_WALK
+
+    for corpus in corpora:
+        doc = pf.load(io.StringIO(read(corpus)))
+        found = []
+        t1 = best(lambda: doc.walk(collect))
+        t2 = best(lambda: list(doc.iter(pf.Header)))
+        t3 = best(lambda: doc.find_all(pf.Header))  # Indexed on first call
+        t4 = best(lambda: doc.walk(first))
+        t5 = best(lambda: doc.walk(first, topdown=True))
+        print(' - {:<16}{:8.4f}{:8.4f}{:8.4f}{:8.4f}{:8.4f}'.format(
+            corpus, t1, t2, t3, t4, t5))
+
+
+def bench_siblings():
+    print('\nVisit every block and inline and its next sibling (seconds):')
+
+    def action(elem, doc):
+        if isinstance(elem, (pf.Block, pf.Inline)):
+            elem.next
+
+    for corpus in corpora:
+        doc = pf.load(io.StringIO(read(corpus)))
+        t1 = best(lambda: doc.walk(action))
+        print(' - {:<16}{:8.4f}'.format(corpus, t1))
+
+
+def bench_doc():
+    print('\nFind the root document of every element (seconds):')
+    for corpus in corpora:
+        doc = pf.load(io.StringIO(read(corpus)))
+        elems = list(doc.iter())
+        t1 = best(lambda: [elem.doc for elem in elems])
+        print(' - {:<16}{:8.4f}'.format(corpus, t1))
+
+
+def walk_stringify(element, newlines=True):
+    """stringify() as it was before the read-only version"""
+
+    def attach_str(e, doc, answer):
+        if hasattr(e, 'text'):
+            ans = e.text
+        elif isinstance(e, (pf.Space, pf.LineBreak, pf.SoftBreak)):
+            ans = ' '
+        elif isinstance(e, pf.Para) and newlines:
+            ans = '\n\n'
+        else:
+            ans = ''
+        if type(e.parent) is pf.Quoted:
+            if e.index == 0:
+                ans = '"' + ans
+            if e.index == len(e.container) - 1:
+                ans += '"'
+        answer.append(ans)
+
+    answer = []
+    element.walk(partial(attach_str, answer=answer))
+    return ''.join(answer)
+
+
+def bench_stringify():
+    print('\nStringify the document, then each header and table cell '
+          '(seconds; walk vs read-only vs cached):')
+    for corpus in corpora:
+        doc = pf.load(io.StringIO(read(corpus)))
+        parts = [doc] + list(doc.iter((pf.Header, pf.TableCell)))
+        assert [walk_stringify(e) for e in parts] == \
+            [pf.stringify(e) for e in parts]
+        t1 = best(lambda: [walk_stringify(e) for e in parts])
+        t2 = best(lambda: [pf.stringify(e) for e in parts])
+        t3 = best(lambda: [pf.stringify(e, cache=True) for e in parts])
+        print(' - {:<16}{:8.4f}{:8.4f}{:8.4f}'.format(corpus, t1, t2, t3))
+
+
+def bench_get_metadata():
+    print('\nRead all the metadata of 20 documents '
+          '(seconds; first call vs later calls):')
+    for corpus in corpora:
+        raw = read(corpus)
+        docs = [pf.load(io.StringIO(raw)) for i in range(20)]
+        t1 = best(lambda: [doc.get_metadata() for doc in docs], repeat=1)
+        t2 = best(lambda: [doc.get_metadata() for doc in docs])
+        compare(corpus, t1, t2)
+
+
+def bench_lazy_metadata():
+    print('\nLoad, read the title and dump (seconds; eager vs lazy):')
+    for corpus in corpora:
+        raw = read(corpus)
+
+        def run(lazy):
+            doc = pf.load(io.StringIO(raw), trusted=True, lazy=lazy)
+            doc.get_metadata('title')
+            pf.dump(doc, io.StringIO())
+
+        t1 = best(lambda: run(False))
+        t2 = best(lambda: run(True))
+        compare(corpus, t1, t2)
+
+
+def bench_convert_text():
+    print('\nConvert 100 markdown fragments (seconds; process vs server):')
+    try:
+        pf.run_pandoc('', ['--version'])
+    except OSError:
+        print(' - skipped (pandoc not found)')
+        return
+    texts = ['Some *markdown* number {}'.format(i) for i in range(100)]
+    ans = []
+    for name in ('process', 'server'):
+        pf.runners.set_runner(name)
+        try:
+            pf.convert_text('')  # Start the server
+            ans.append(best(lambda: [pf.convert_text(t) for t in texts], 3))
+        finally:
+            pf.runners.set_runner(None)
+    t1, t2 = ans
+    compare('markdown', t1, t2)
+
+
+def bench_convert_text_many():
+    print('\nConvert 100 markdown fragments to panflute and html '
+          '(seconds; one by one vs batched):')
+    try:
+        pf.run_pandoc('', ['--version'])
+    except OSError:
+        print(' - skipped (pandoc not found)')
+        return
+    texts = ['Some *markdown* number {}'.format(i) for i in range(100)]
+    for fmt in ('panflute', 'html'):
+        t1 = best(lambda: [pf.convert_text(t, output_format=fmt)
+                           for t in texts], 3)
+        t2 = best(lambda: pf.convert_text_many(texts, output_format=fmt), 3)
+        compare(fmt, t1, t2)
+
+
+def bench_convert_text_cache():
+    print('\nConvert 100 markdown fragments twice '
+          '(seconds; uncached vs cached):')
+    try:
+        pf.run_pandoc('', ['--version'])
+    except OSError:
+        print(' - skipped (pandoc not found)')
+        return
+    texts = ['Some *markdown* number {}'.format(i) for i in range(100)] * 2
+
+    def cached():
+        cache = pf.cache.ConversionCache()
+        return [pf.convert_text(t, cache=cache) for t in texts]
+
+    t1 = best(lambda: [pf.convert_text(t) for t in texts], 3)
+    t2 = best(cached, 3)
+    compare('markdown', t1, t2)
+
+
+if __name__ == "__main__":
+    bench_load()
+    bench_passthrough()
+    bench_noop_filter()
+    bench_walk()
+    bench_dispatch()
+    bench_fused()
+    bench_find()
+    bench_siblings()
+    bench_doc()
+    bench_stringify()
+    bench_get_metadata()
+    bench_lazy_metadata()
+    bench_convert_text()
+    bench_convert_text_many()
+    bench_convert_text_cache()
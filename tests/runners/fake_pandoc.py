@@ -0,0 +1,121 @@
+"""
+Stand-in for the pandoc executable, used by test_runners.py
+and test_convert_text_many.py
+
+Tests call install() to get an executable that runs this script
+(so the stand-in is only used on systems with /bin/sh).
+
+It "converts" the text by upper-casing it, and adds the process id
+so the tests can tell which process did the work. Conversions from or
+to JSON understand a tiny subset of markdown and html instead: paragraphs
+of words, and code blocks that start with ``` and are never closed.
+"""
+
+import os
+import sys
+import json
+import stat
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+
+def install(folder):
+    """Create a 'pandoc' executable in the folder and return its path"""
+    fn = os.path.join(folder, 'pandoc')
+    with open(fn, 'w') as f:
+        f.write('#!/bin/sh\nexec "{}" "{}" "$@"\n'.format(
+            sys.executable, os.path.abspath(__file__)))
+    os.chmod(fn, os.stat(fn).st_mode | stat.S_IEXEC)
+    return fn
+
+
+def read_markdown(text):
+    blocks = []
+    paras = text.split('\n\n')
+    for i, para in enumerate(paras):
+        if para.startswith('```'):
+            code = '\n\n'.join(paras[i:])[3:].strip('\n')
+            blocks.append({'t': 'CodeBlock', 'c': [['', [], []], code]})
+            break
+        inlines = []
+        for word in para.split():
+            inlines += [{'t': 'Space'}, {'t': 'Str', 'c': word}]
+        if inlines:
+            blocks.append({'t': 'Para', 'c': inlines[1:]})
+    return {'pandoc-api-version': [1, 22], 'meta': {}, 'blocks': blocks}
+
+
+def write_html(doc):
+    lines = []
+    for block in doc['blocks']:
+        if block['t'] == 'CodeBlock':
+            lines.append('<pre><code>{}</code></pre>'.format(block['c'][1]))
+        else:
+            words = [x['c'] for x in block['c'] if x['t'] == 'Str']
+            lines.append('<p>{}</p>'.format(' '.join(words)))
+    return '\n'.join(lines) + '\n'
+
+
+def convert(text, params):
+    log = os.environ.get('FAKE_PANDOC_LOG')
+    if log:
+        with open(log, 'a') as f:
+            f.write('{}>{}\n'.format(params.get('from'), params.get('to')))
+    if params.get('from') == 'json' or params.get('to') == 'json':
+        doc = json.loads(text) if params.get('from') == 'json' \
+            else read_markdown(text)
+        return json.dumps(doc) if params.get('to') == 'json' \
+            else write_html(doc)
+    return '{} {}>{}{}:{}'.format(
+        os.getpid(), params.get('from'), params.get('to'),
+        ' standalone' if params.get('standalone') else '', text.upper())
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        size = int(self.headers['Content-Length'])
+        params = json.loads(self.rfile.read(size).decode('utf-8'))
+        if params['text'] == 'fail':
+            ans = {'error': 'failed'}
+        else:
+            ans = {'output': convert(params['text'], params),
+                   'base64': False, 'messages': []}
+        body = json.dumps(ans).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def main(args):
+    if args == ['--version']:
+        print('pandoc 3.1.fake')
+        return
+
+    if args and args[0] == 'server':
+        if os.environ.get('FAKE_PANDOC_NO_SERVER'):
+            sys.exit('server: openBinaryFile: does not exist')
+        port = int(args[1].split('=')[1])
+        Server(('127.0.0.1', port), Handler).serve_forever()
+
+    params = {'standalone': '--standalone' in args}
+    for arg in args:
+        if arg.startswith('--from=') or arg.startswith('--to='):
+            name, value = arg[2:].split('=')
+            params[name] = value
+    text = sys.stdin.buffer.read().decode('utf-8')
+    if text == 'fail':
+        sys.exit('failed')
+    sys.stdout.buffer.write(convert(text, params).encode('utf-8'))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
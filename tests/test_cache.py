@@ -0,0 +1,118 @@
+import os
+import runpy
+import tempfile
+
+import pytest
+import panflute as pf
+from panflute.cache import ConversionCache, get_cache, set_cache
+from panflute.runners import set_runner
+
+fake_pandoc = runpy.run_path('./tests/runners/fake_pandoc.py')['install']
+
+
+def test_memory():
+    cache = ConversionCache(maxsize=2)
+    cache.set('a', '1')
+    cache.set('b', '2')
+    assert cache.get('a') == '1'  # Now 'b' is the least recently used
+    cache.set('c', '3')
+    assert cache.get('b') is None
+    assert [cache.get(k) for k in 'ac'] == ['1', '3']
+
+    key = cache.key('x', 'markdown', 'json', [], 'pandoc 3.1')
+    assert key == cache.key('x', 'markdown', 'json', [], 'pandoc 3.1')
+    assert key != cache.key('x', 'markdown', 'json', [], 'pandoc 3.2')
+    assert key != cache.key('x', 'markdown', 'json', ['--toc'], 'pandoc 3.1')
+    assert key != cache.key('x', 'markdown', 'json', [], 'pandoc 3.1',
+                            batched=True)
+
+
+def test_disk():
+    with tempfile.TemporaryDirectory() as folder:
+        cache = ConversionCache(path=folder, max_disk_size=250)
+        for i in range(3):
+            cache.set(str(i), str(i) * 100)
+            os.utime(os.path.join(folder, str(i)), (i, i))
+
+        # Other processes (and later runs) read the files
+        other = ConversionCache(path=folder, max_disk_size=250)
+        assert other.get('1') == '1' * 100
+        assert other.get('missing') is None
+
+        # Over the size limit: the least recently used files are deleted
+        cache.set('3', '3' * 100)
+        assert sorted(os.listdir(folder)) == ['1', '3']
+        assert cache.get('0') == '0' * 100  # Still in memory
+        assert ConversionCache(path=folder).get('0') is None
+
+        cache.clear()
+        assert os.listdir(folder) == [] and cache.get('1') is None
+
+        # Replaced files are only counted once
+        cache.set('a', 'a' * 100)
+        cache.set('a', 'b' * 100)
+        assert cache.disk_size == 100 and os.listdir(folder) == ['a']
+
+
+@pytest.mark.skipif(os.name == 'nt', reason='shell stand-in')
+def test_convert_text():
+    with tempfile.TemporaryDirectory() as folder:
+        log = os.path.join(folder, 'log.txt')
+        os.environ['FAKE_PANDOC_LOG'] = log
+        set_runner('process', pandoc_path=fake_pandoc(folder))
+        set_cache(ConversionCache(path=os.path.join(folder, 'cache')))
+
+        def calls():
+            if not os.path.exists(log):
+                return 0
+            with open(log) as f:
+                return len(f.read().split())
+
+        try:
+            a = pf.convert_text('a b\n\nc')
+            b = pf.convert_text('a b\n\nc')
+            assert calls() == 1
+            assert repr(a) == repr(b) == \
+                '[Para(Str(a) Space Str(b)), Para(Str(c))]'
+
+            # Results are new elements every time
+            assert a[0] is not b[0]
+            assert a[0].parent is None and a[0].next is None
+            a[0].content[0].text = 'z'
+            assert pf.convert_text('a b\n\nc')[0].content[0].text == 'a'
+
+            # Other arguments and formats are other entries
+            pf.convert_text('a b\n\nc', extra_args=['--columns=10'])
+            html = pf.convert_text('a b\n\nc', output_format='html')
+            assert pf.convert_text('a b\n\nc', output_format='html') == html
+            pf.convert_text('a b\n\nc', cache=False)
+            assert calls() == 4
+
+            # Only the fragments that are not cached are converted
+            ans = pf.convert_text_many(['d', 'a b\n\nc', 'e', 'f'])
+            assert calls() == 6  # And once for the api-version
+            assert repr(ans[1]) == repr(b)
+            assert [repr(x) for x in pf.convert_text_many(['d', 'f'])] == \
+                ['[Para(Str(d))]', '[Para(Str(f))]']
+            assert calls() == 6
+
+            # Fragments converted together are not reused one by one,
+            # and the other way around
+            assert pf.convert_text('e')[0].content[0].text == 'e'
+            assert calls() == 7
+            ans = pf.convert_text_many(['a b\n\nc', 'g'], output_format='html')
+            assert ans == ['<p>a b</p>\n<p>c</p>', '<p>g</p>']
+            assert calls() == 9
+            assert pf.convert_text('a b\n\nc', output_format='html') == html
+            assert calls() == 9
+        finally:
+            set_cache(None)
+            set_runner(None)
+            del os.environ['FAKE_PANDOC_LOG']
+    assert get_cache() is None
+
+
+if __name__ == "__main__":
+    test_memory()
+    test_disk()
+    test_convert_text()
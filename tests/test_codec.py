@@ -0,0 +1,49 @@
+import io
+import panflute as pf
+from panflute.codec import get_codec, set_codec, CODECS
+
+
+def available_codecs():
+    ans = []
+    for name in CODECS:
+        try:
+            ans.append(get_codec(name))
+        except ImportError:
+            pass
+    return ans
+
+
+def test_identical_output():
+    fns = ['./tests/1/api117/benchmark.json',
+           './tests/1/api118/benchmark.json',
+           './tests/3/api118/benchmark.json',
+           './tests/input/barcode/benchmark.json']
+
+    for fn in fns:
+        with open(fn, encoding='utf-8') as f:
+            raw = f.read().strip()
+
+        for codec in available_codecs():
+            set_codec(codec.name)
+            try:
+                doc = pf.load(io.StringIO(raw))
+                with io.StringIO() as f:
+                    pf.dump(doc, f)
+                    assert f.getvalue() == raw
+            finally:
+                set_codec(None)
+
+
+def test_fallback():
+    # Values that orjson/ujson would write differently than the stdlib
+    objs = [[1e-05, 1e+16, 0.00009], [2 ** 70], ['\ud800'], [float('nan')],
+            pf.Para(pf.Str('café'), pf.Space, pf.Str('"x"\n\t\x01'))]
+    stdlib = get_codec('json')
+    for codec in available_codecs():
+        for obj in objs:
+            assert codec.dumps(obj) == stdlib.dumps(obj), (codec.name, obj)
+
+
+if __name__ == "__main__":
+    test_identical_output()
+    test_fallback()
@@ -0,0 +1,99 @@
+import os
+import runpy
+import tempfile
+
+import pytest
+import panflute as pf
+from panflute.runners import set_runner
+
+pytestmark = pytest.mark.skipif(os.name == 'nt', reason='shell stand-in')
+
+fake_pandoc = runpy.run_path('./tests/runners/fake_pandoc.py')['install']
+
+
+def run(function, *args, **kwargs):
+    """Call the function with the stand-in pandoc, and log its calls"""
+    with tempfile.TemporaryDirectory() as folder:
+        log = os.path.join(folder, 'log.txt')
+        os.environ['FAKE_PANDOC_LOG'] = log
+        set_runner('process', pandoc_path=fake_pandoc(folder))
+        try:
+            ans = function(*args, **kwargs)
+        finally:
+            set_runner(None)
+            del os.environ['FAKE_PANDOC_LOG']
+        if not os.path.exists(log):
+            return ans, []
+        with open(log) as f:
+            return ans, f.read().split()
+
+
+def test_panflute_output():
+    texts = ['a b', '', 'c\n\nd e', 'f']
+    ans, calls = run(pf.convert_text_many, texts)
+    assert calls == ['markdown>json']
+    ref, ref_calls = run(lambda: [pf.convert_text(t) for t in texts])
+    assert len(ref_calls) == len(texts)
+    assert repr(ans) == repr(ref)
+    assert repr(ans[2]) == '[Para(Str(c)), Para(Str(d) Space Str(e))]'
+    assert ans[2][0].parent is None and ans[2][0].next is None
+
+
+def test_text_output():
+    texts = ['a b', 'c\n\nd', '', 'e']
+    ans, calls = run(pf.convert_text_many, texts, output_format='html')
+    assert calls == ['markdown>json', 'json>html']
+    assert ans == ['<p>a b</p>', '<p>c</p>\n<p>d</p>', '', '<p>e</p>']
+
+    # From panflute elements
+    elems = [pf.Para(pf.Str('x')), [pf.Para(pf.Str('y')), pf.Para()]]
+    ans, calls = run(pf.convert_text_many, elems, input_format='panflute',
+                     output_format='html')
+    assert calls == ['markdown>json', 'json>html']  # Once for api-version
+    assert ans == ['<p>x</p>', '<p>y</p>\n<p></p>']
+
+
+def test_panflute_input():
+    para = pf.Para(pf.Str('x'))
+    doc = pf.Doc(para, pf.Para(pf.Str('y')))
+    free = pf.Para(pf.Str('z'))
+    texts = [para, [doc.content[1], free]]
+
+    def check():
+        # The elements given are left where they are
+        assert para.parent is doc and para.doc is doc
+        assert doc.content[1].parent is doc and free.parent is None
+        assert len(doc.content) == 2
+
+    ans, calls = run(pf.convert_text_many, texts, input_format='panflute',
+                     output_format='html')
+    assert calls == ['markdown>json', 'json>html']
+    assert ans == ['<p>x</p>', '<p>y</p>\n<p>z</p>']
+    check()
+
+    # Each fragment goes in its own Div
+    ans, calls = run(pf.convert_text_many, texts, input_format='panflute')
+    assert calls == ['markdown>json', 'json>json']
+    assert repr(ans) == '[[Para(Str(x))], [Para(Str(y)), Para(Str(z))]]'
+    assert ans[0][0] is not para
+    assert all(x.parent is None and x.doc is None for x in ans[1])
+    assert ans[1][0].index is None and ans[1][0].next is None
+    check()
+
+
+def test_fallback():
+    # The code block swallows the markers of the next fragments
+    texts = ['a', '```\ncode', 'b']
+    ans, calls = run(pf.convert_text_many, texts)
+    assert calls == ['markdown>json'] * 4
+    assert repr(ans) == "[[Para(Str(a))], [CodeBlock(code)], [Para(Str(b))]]"
+
+    ans, calls = run(pf.convert_text_many, [], output_format='html')
+    assert ans == [] and calls == []
+
+
+if __name__ == "__main__":
+    test_panflute_output()
+    test_text_output()
+    test_panflute_input()
+    test_fallback()
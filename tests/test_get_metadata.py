@@ -38,5 +38,35 @@ def test():
 
     print('\nDone...')
 
+
+def test_cache():
+    fn = "./tests/input/heavy_metadata/benchmark.json"
+    with open(fn, encoding='utf-8') as f:
+        doc = pf.load(f)
+
+    # Results can be modified without affecting later calls
+    meta = doc.get_metadata('key1.key1-1')
+    meta.append('x')
+    assert doc.get_metadata('key1.key1-1') == ['value1-1-1', 'value1-1-2']
+    full = doc.get_metadata()
+    full['amsthm']['plain'].clear()
+    assert doc.get_metadata('amsthm.plain')[0]['Theorem'] == 'Lemma'
+
+    # Modifications of the metadata are seen
+    doc.metadata['key1']['key1-1'].content.append(pf.MetaString('v'))
+    assert doc.get_metadata('key1.key1-1')[-1] == 'v'
+    doc.metadata['key1']['key1-1'].content[-1].text = 'w'
+    assert doc.get_metadata('key1.key1-1')[-1] == 'w'
+    doc.get_metadata('title', builtin=False).content[0].text = 'New'
+    assert doc.get_metadata('title').startswith('New ')
+    assert doc.get_metadata()['title'].startswith('New ')
+    doc.metadata['title'] = pf.MetaString('Other')
+    assert doc.get_metadata('title') == 'Other'
+    doc.metadata = {'title': pf.MetaBool(True)}
+    assert doc.get_metadata('title') is True
+    assert doc.get_metadata() == {'title': True}
+
+
 if __name__ == "__main__":
     test()
+    test_cache()
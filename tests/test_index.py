@@ -0,0 +1,203 @@
+import io
+import pytest
+import panflute as pf
+
+
+def load(fn='./tests/1/api118/benchmark.json', lazy=False):
+    with open(fn, encoding='utf-8') as f:
+        return pf.load(f, lazy=lazy)
+
+
+def check_index(doc, classes=(pf.Header, pf.Str, pf.Inline, pf.MetaValue)):
+    for cls in classes:
+        found = doc.find_all(cls)
+        expected = list(doc.iter(cls))
+        assert len(found) == len(expected)
+        assert set(map(id, found)) == set(map(id, expected))
+
+
+def test_find_all():
+    for lazy in (False, True):
+        doc = load(lazy=lazy)
+        headers = doc.find_all(pf.Header)
+        assert headers and headers == list(doc.iter(pf.Header))
+        check_index(doc)
+
+    doc = pf.Doc(pf.Para(pf.Str('a')), pf.Header(pf.Str('b')))
+    assert doc.find_all(pf.Doc) == [doc]
+    assert doc.find_all((pf.Para, pf.Header)) == list(doc.content)
+
+
+def test_find_all_updates():
+    doc = load()
+    check_index(doc)
+
+    # Containers
+    doc.content.insert(0, pf.Header(pf.Str('new'), pf.Emph(pf.Str('x'))))
+    doc.content.append(pf.Para(pf.Str('last')))
+    del doc.content[4]
+    doc.content[1] = pf.Div(pf.Header(pf.Str('inside')))
+    doc.content[4:6] = [pf.Para(pf.Str('y'))]
+    doc.content.pop()
+    para = doc.find_all(pf.Para)[0]
+    para.content.extend([pf.Space, pf.Str('z')])
+    para.content.reverse()
+    check_index(doc)
+
+    # Attributes
+    para.content = [pf.Str('replaced')]
+    table = doc.find_all(pf.Table)[0]
+    table.caption = [pf.Str('caption')]
+    table.header = None
+    doc.metadata['new'] = pf.MetaInlines(pf.Str('meta'))
+    doc.metadata = {'other': pf.MetaString('x')}
+    check_index(doc)
+    assert not any(elem.text == 'meta' for elem in doc.find_all(pf.Str))
+
+    # Walks
+    def action(elem, doc):
+        if isinstance(elem, pf.Header):
+            return pf.Para(*elem.content)
+        elif isinstance(elem, pf.Space):
+            return []
+        elif isinstance(elem, pf.Emph):
+            return [pf.Strong(*elem.content), pf.Str('!')]
+
+    doc.walk(action)
+    assert not doc.find_all(pf.Header)
+    assert not doc.find_all(pf.Emph)
+    check_index(doc)
+
+    # Elements not in the document are not indexed
+    header = pf.Header(pf.Str('orphan'))
+    header.content.append(pf.Str('more'))
+    check_index(doc)
+
+
+def test_find_all_in_action():
+    doc = load()
+    ref = [pf.stringify(h) for h in doc.iter(pf.Header)]
+
+    def action(elem, doc):
+        if isinstance(elem, pf.Header):
+            assert elem in doc.find_all(pf.Header)
+            return pf.Div(pf.Para(*elem.content), classes=['header'])
+
+    doc.walk(action)
+    with io.StringIO() as f:
+        pf.dump(doc, f)
+    divs = doc.find_all(pf.Div)
+    assert [pf.stringify(div, newlines=False) for div in divs
+            if 'header' in div.classes] == ref
+
+
+def test_find_by_id():
+    doc = load()
+    ids = [e for e in doc.iter() if getattr(e, 'identifier', '')]
+    assert ids
+    for elem in ids:
+        assert doc.find_by_id(elem.identifier).identifier == elem.identifier
+    assert doc.find_by_id('missing') is None
+    assert doc.find_by_id('') is None
+    assert not doc.duplicate_ids()
+
+    # Renames, insertions and deletions
+    header = doc.find_all(pf.Header)[0]
+    old = header.identifier
+    header.identifier = 'renamed'
+    assert doc.find_by_id('renamed') is header
+    assert doc.find_by_id(old) is None
+
+    div = pf.Div(pf.Para(pf.Span(pf.Str('a'), identifier='fig:a')),
+                 identifier='sec:a')
+    doc.content.append(div)
+    assert doc.find_by_id('fig:a') is div.content[0].content[0]
+    assert doc.find_by_id('sec:a') is div
+
+    doc.content.insert(0, pf.Header(pf.Str('b'), identifier='renamed'))
+    assert doc.duplicate_ids() == {'renamed': [header, doc.content[0]]}
+    del doc.content[0]
+    assert not doc.duplicate_ids()
+
+    doc.content.pop()
+    assert doc.find_by_id('fig:a') is None
+
+    # Walks and elements outside the document
+    def action(elem, doc):
+        if isinstance(elem, pf.Header) and elem.identifier == 'renamed':
+            return pf.Div(identifier='renamed')
+
+    doc.walk(action)
+    assert isinstance(doc.find_by_id('renamed'), pf.Div)
+    header.identifier = 'detached'
+    assert doc.find_by_id('detached') is None
+
+    # Elements also used to build other elements are moved, and the
+    # index of the document they are taken from is built again
+    span = pf.Span(pf.Str('s'), identifier='span')
+    doc.content.append(pf.Para(span))
+    assert doc.find_by_id('span') is span
+    plain = pf.Plain(*doc.content[-1].content)
+    assert plain.content[0] is span and span.parent is plain
+    span.identifier = 'span2'
+    assert doc.find_by_id('span2') is span
+    assert doc.find_by_id('span') is None
+
+
+def check_positions(container):
+    for i, item in enumerate(container):
+        assert item.index == i
+        assert item.prev is (container[i - 1] if i else None)
+
+
+def test_positions():
+    para = pf.Para(*[pf.Str(str(i)) for i in range(50)])
+    items = para.content
+    check_positions(items)
+
+    items.insert(10, pf.Emph(pf.Str('x')))
+    del items[3]
+    items.append(pf.Str('last'))
+    items[20] = pf.Space()
+    items[5:8] = [pf.Str('a'), pf.Str('b')]
+    items.reverse()
+    check_positions(items)
+    assert items[0].offset(2) is items[2]
+    assert items[-1].next is None
+
+    # Merge adjacent Str elements while walking
+    def merge(elem, doc):
+        if isinstance(elem, pf.Str):
+            while isinstance(elem.next, pf.Str):
+                elem.text += elem.next.text
+                del elem.parent.content[elem.index + 1]
+
+    para.walk(merge)
+    assert [type(x) for x in items] == [pf.Str, pf.Space, pf.Str,
+                                         pf.Emph, pf.Str]
+    check_positions(items)
+
+    # Items that appear twice are at their first position
+    space = pf.Space()
+    items = pf.Para(pf.Str('a'), space, pf.Str('b'), space, pf.Str('c')).content
+    assert items[-1].index == 4  # Scans past the second occurrence
+    assert space.index == 1
+    items[0] = space
+    assert space.index == 0
+    del items[0]
+    assert space.index == 0
+
+    # Walk replacements and lazily loaded documents
+    doc = load(lazy=True)
+    doc.walk(lambda elem, doc: [] if isinstance(elem, pf.Header) else None)
+    check_positions(doc.content)
+    with pytest.raises(ValueError):
+        items.position(pf.Str('missing'))
+
+
+if __name__ == "__main__":
+    test_find_all()
+    test_find_all_updates()
+    test_find_all_in_action()
+    test_find_by_id()
+    test_positions()
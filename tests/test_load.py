@@ -0,0 +1,283 @@
+import io
+import json
+import pytest
+import panflute as pf
+from panflute.elements import from_json
+from panflute.containers import RawJSON
+
+
+def test_from_json():
+    raw = '{"t":"Quoted","c":[{"t":"SingleQuote"},[{"t":"Str","c":"a"},{"t":"Space"}]]}'
+    elem = json.loads(raw, object_pairs_hook=from_json)
+    assert type(elem) == pf.Quoted
+    assert elem.quote_type == 'SingleQuote'
+    assert repr(elem.content) == 'ListContainer(Str(a) Space)'
+
+    # Key order is not always "t" then "c"
+    raw = '{"c":"hello","t":"Str"}'
+    elem = json.loads(raw, object_pairs_hook=from_json)
+    assert elem.text == 'hello'
+
+    # Metadata maps are returned as dicts
+    raw = '{"a":{"t":"MetaBool","c":true}}'
+    meta = json.loads(raw, object_pairs_hook=from_json)
+    assert list(meta) == ['a'] and meta['a'].boolean is True
+
+    with pytest.raises(Exception):
+        json.loads('{"t":"Foo","c":[]}', object_pairs_hook=from_json)
+
+
+def test_load_roundtrip():
+    fn = './tests/fenced/input.json'
+    with open(fn, encoding='utf-8') as f:
+        raw = f.read()
+    doc = pf.load(io.StringIO(raw))
+    with io.StringIO() as f:
+        pf.dump(doc, f)
+        assert f.getvalue() == raw.strip()
+
+
+def test_dump_chunks():
+    fn = './tests/fenced/input.json'
+    with open(fn, encoding='utf-8') as f:
+        raw = f.read().strip()
+    doc = pf.load(io.StringIO(raw))
+
+    class Stream(io.StringIO):
+        writes = 0
+
+        def write(self, text):
+            self.writes += 1
+            return super().write(text)
+
+    buffer_size, batch_size = pf.io._JSONWriter.buffer_size, pf.io._JSONWriter.batch_size
+    try:
+        pf.io._JSONWriter.buffer_size = 100
+        pf.io._JSONWriter.batch_size = 2
+        with Stream() as f:
+            pf.dump(doc, f)
+            assert f.getvalue() == raw
+            assert f.writes > 1
+        # Empty document
+        with io.StringIO() as f:
+            pf.dump(pf.Doc(api_version=doc.api_version), f)
+            assert pf.load(io.StringIO(f.getvalue())).content.list == []
+    finally:
+        pf.io._JSONWriter.buffer_size = buffer_size
+        pf.io._JSONWriter.batch_size = batch_size
+
+
+def test_load_trusted():
+    fns = ['./tests/1/api117/benchmark.json',
+           './tests/1/api118/benchmark.json',
+           './tests/input/heavy_metadata/benchmark.json']
+
+    for fn in fns:
+        with open(fn, encoding='utf-8') as f:
+            raw = f.read()
+        doc = pf.load(io.StringIO(raw))
+        trusted_doc = pf.load(io.StringIO(raw), trusted=True)
+        assert repr(doc) == repr(trusted_doc)
+        assert doc.api_version == trusted_doc.api_version
+
+        with io.StringIO() as f:
+            pf.dump(trusted_doc, f)
+            assert f.getvalue() == raw.strip()
+
+    # Trusted elements behave like the validated ones
+    para = trusted_doc.content[0]
+    assert para.doc is trusted_doc
+    para.content.append(pf.Str('!'))
+    with pytest.raises(TypeError):
+        para.content.append(pf.Para())
+
+
+def test_load_blocks():
+    fns = ['./tests/1/api117/benchmark.json',
+           './tests/1/api118/benchmark.json',
+           './tests/input/heavy_metadata/benchmark.json']
+
+    # Use a tiny buffer so blocks are split across reads
+    chunk_size = pf.io._JSONReader.chunk_size
+    pf.io._JSONReader.chunk_size = 10
+
+    try:
+        for fn in fns:
+            with open(fn, encoding='utf-8') as f:
+                raw = f.read()
+            doc = pf.load(io.StringIO(raw))
+
+            for trusted in (False, True):
+                meta_doc, blocks = pf.load_blocks(io.StringIO(raw),
+                                                  trusted=trusted)
+                assert meta_doc.api_version == doc.api_version
+                assert repr(meta_doc.metadata) == repr(doc.metadata)
+                assert not meta_doc.content
+                blocks = list(blocks)
+                assert repr(blocks) == repr(doc.content.list)
+    finally:
+        pf.io._JSONReader.chunk_size = chunk_size
+
+    # Metadata after the blocks
+    raw = '{"blocks":[{"t":"Para","c":[{"t":"Str","c":"a"}]}],' \
+          '"pandoc-api-version":[1,17,0,4],"meta":{}}'
+    doc, blocks = pf.load_blocks(io.StringIO(raw))
+    assert doc.api_version == (1, 17, 0, 4)
+    assert repr(list(blocks)) == '[Para(Str(a))]'
+
+    # Truncated document
+    with pytest.raises(ValueError):
+        doc, blocks = pf.load_blocks(io.StringIO(raw[:-10]))
+        list(blocks)
+
+
+def test_load_lazy():
+    fns = ['./tests/1/api118/benchmark.json',
+           './tests/2/api117/benchmark.json',
+           './tests/input/heavy_metadata/benchmark.json']
+
+    for fn in fns:
+        with open(fn, encoding='utf-8') as f:
+            raw = f.read().strip()
+        ref = pf.load(io.StringIO(raw))
+        with io.StringIO() as f:
+            pf.dump(ref, f)
+            ref_json = f.getvalue()
+
+        # Decoded blocks also keep their JSON text
+        assert all(x._cache for x in ref.content.list)
+        assert ref_json == raw
+
+        doc = pf.load(io.StringIO(raw), lazy=True)
+        assert repr(doc.metadata) == repr(ref.metadata)
+        assert all(type(x) is RawJSON for x in doc.content.list)
+
+        # Untouched blocks are written back as they were
+        with io.StringIO() as f:
+            pf.dump(doc, f)
+            assert f.getvalue() == raw
+
+        # Accessing a block decodes it
+        n = len(doc.content) // 2
+        block = doc.content[n]
+        assert block.parent is doc
+        assert repr(block) == repr(ref.content[n])
+        assert block is doc.content[n]
+        assert type(doc.content.list[n]) is not RawJSON
+
+        doc.walk(upper_str)
+        ref.walk(upper_str)
+        assert not any(type(x) is RawJSON for x in doc.content.list)
+        assert pf.stringify(doc) == pf.stringify(ref)
+
+    # Errors are raised when the block is decoded
+    raw = '{"pandoc-api-version":[1,17,0,4],"meta":{},' \
+          '"blocks":[{"t":"Para","c":[]},{"t":"Foo","c":[]}]}'
+    doc = pf.load(io.StringIO(raw), lazy=True)
+    assert repr(doc.content[0]) == 'Para()'
+    with pytest.raises(Exception):
+        doc.content[1]
+
+
+def test_dirty_tracking():
+    doc = pf.Doc(pf.Para(pf.Str('a'), pf.Space, pf.Emph(pf.Str('b'))),
+                 pf.CodeBlock('x = 1', classes=['python']),
+                 pf.Div(pf.Para(pf.Link(pf.Str('c'), url='d'))),
+                 pf.Table(pf.TableRow(pf.TableCell(pf.Plain(pf.Str('e'))))),
+                 pf.Header(pf.Str('f'), level=2),
+                 api_version=(1, 17, 0, 4))
+    with io.StringIO() as f:
+        pf.dump(doc, f)
+        raw = f.getvalue()
+
+    def changes():
+        yield lambda doc: doc.content[0].content[2].content[0].__setattr__('text', 'B')
+        yield lambda doc: doc.content[1].classes.append('numberLines')
+        yield lambda doc: doc.content[2].content[0].content[0].attributes.update(k='v')
+        yield lambda doc: doc.content[3].alignment.__setitem__(0, 'AlignLeft')
+        yield lambda doc: doc.content[0].content.pop()
+        yield lambda doc: doc.content[2].content.append(pf.HorizontalRule())
+        yield lambda doc: setattr(doc.content[4], 'level', 3)
+
+    changed_blocks = [0, 1, 2, 3, 0, 2, 4]
+    for change, changed in zip(changes(), changed_blocks):
+        for trusted in (False, True):
+            for lazy in (False, True):
+                doc = pf.load(io.StringIO(raw), trusted=trusted, lazy=lazy)
+                doc = doc.walk(lambda elem, doc: None)
+                assert all(x._cache for x in doc.content.list)
+
+                change(doc)
+                assert [x._cache is None for x in doc.content.list] == \
+                    [j == changed for j in range(5)]
+
+                ref = pf.load(io.StringIO(raw))
+                change(ref)
+                with io.StringIO() as f, io.StringIO() as g:
+                    pf.dump(doc, f)
+                    pf.dump(ref, g)
+                    assert f.getvalue() == g.getvalue()
+                    assert f.getvalue() != raw
+
+
+def test_lazy_metadata():
+    fn = './tests/input/heavy_metadata/benchmark.json'
+    with open(fn, encoding='utf-8') as f:
+        raw = f.read()
+
+    for trusted in (False, True):
+        ref = pf.load(io.StringIO(raw))
+        doc = pf.load(io.StringIO(raw), trusted=trusted, lazy=True)
+        values = doc.metadata.content.dict
+        assert all(type(x) is RawJSON for x in values.values())
+
+        # Accessing a key only decodes its value
+        assert doc.get_metadata('title') == ref.get_metadata('title')
+        assert type(values['title']) is pf.MetaInlines
+        assert values['title'].parent is doc.metadata
+        assert type(values['abstract']) is RawJSON
+        assert repr(doc.metadata['abstract']) == repr(ref.metadata['abstract'])
+        assert sum(type(x) is not RawJSON for x in values.values()) == 2
+
+        # Walks skip the values that can't contain the requested types
+        doc.walk({pf.Str: lambda elem, doc: None})
+        assert type(values['toc']) is RawJSON
+        assert type(values['csl']) is not RawJSON
+        assert not list(doc.iter(pf.MetaBool))[0].boolean
+        assert type(values['toc']) is not RawJSON
+
+        # Untouched values are written back as they were
+        with io.StringIO() as f:
+            pf.dump(doc, f)
+            assert f.getvalue() == raw.strip()
+
+        doc.metadata['title'].content.append(pf.Str('!'))
+        doc.metadata['new'] = pf.MetaString('x')
+        ref.metadata['title'].content.append(pf.Str('!'))
+        ref.metadata['new'] = pf.MetaString('x')
+        with io.StringIO() as f, io.StringIO() as g:
+            pf.dump(doc, f)
+            pf.dump(ref, g)
+            assert f.getvalue() == g.getvalue()
+
+    # Legacy documents
+    raw = '[{"unMeta":{"a":{"t":"MetaString","c":"x"}}},[]]'
+    doc = pf.load(io.StringIO(raw), lazy=True)
+    assert type(doc.metadata.content.dict['a']) is RawJSON
+    assert doc.get_metadata('a') == 'x'
+
+
+def upper_str(elem, doc):
+    if isinstance(elem, pf.Str):
+        elem.text = elem.text.upper()
+
+
+if __name__ == "__main__":
+    test_from_json()
+    test_load_roundtrip()
+    test_dump_chunks()
+    test_load_trusted()
+    test_load_blocks()
+    test_load_lazy()
+    test_dirty_tracking()
+    test_lazy_metadata()
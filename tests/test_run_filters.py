@@ -0,0 +1,131 @@
+import io
+import panflute as pf
+
+
+def upper_str(elem, doc):
+    if type(elem) == pf.Str:
+        elem.text = elem.text.upper()
+
+
+def drop_headers(elem, doc):
+    if type(elem) == pf.Header:
+        return []
+
+
+def split_para(elem, doc):
+    if type(elem) == pf.Para and len(elem.content) > 1:
+        return [pf.Para(x) for x in elem.content[:2]]
+
+
+def run(raw, **kwargs):
+    with io.StringIO() as f:
+        pf.run_filters([upper_str, drop_headers, split_para],
+                       input_stream=io.StringIO(raw), output_stream=f,
+                       **kwargs)
+        return f.getvalue()
+
+
+def test_streaming():
+    fns = ['./tests/1/api117/benchmark.json',
+           './tests/1/api118/benchmark.json',
+           './tests/3/api118/benchmark.json',
+           './tests/input/heavy_metadata/benchmark.json']
+
+    for fn in fns:
+        with open(fn, encoding='utf-8') as f:
+            raw = f.read()
+        assert run(raw, streaming=True) == run(raw), fn
+
+
+def test_lazy():
+    fn = './tests/input/heavy_metadata/benchmark.json'
+    with open(fn, encoding='utf-8') as f:
+        raw = f.read()
+    assert run(raw, lazy=True) == run(raw)
+
+
+def test_streaming_doc():
+    seen = []
+
+    def action(elem, doc):
+        if isinstance(elem, pf.Block) and type(elem.parent) == pf.Doc:
+            assert elem.doc is doc and len(doc.content) == 1
+            seen.append(elem.tag)
+
+    def finalize(doc):
+        assert not doc.content
+        assert doc.get_metadata('title') == 'Lorem Ipsum: Title'
+
+    fn = './tests/input/heavy_metadata/benchmark.json'
+    with open(fn, encoding='utf-8') as f:
+        pf.run_filter(action, finalize=finalize, streaming=True,
+                      input_stream=f, output_stream=io.StringIO())
+    assert seen and seen[0] == 'Header'
+
+    # Unless a function needs the entire document
+    sizes = []
+
+    def count(elem, doc):
+        if isinstance(elem, pf.Block) and type(elem.parent) == pf.Doc:
+            sizes.append(len(doc.content))
+    count.whole_document = True
+
+    with open(fn, encoding='utf-8') as f:
+        raw = f.read()
+    with io.StringIO() as f:
+        pf.run_filters([upper_str, count], streaming=True,
+                       input_stream=io.StringIO(raw), output_stream=f)
+        assert sizes == [len(seen)] * len(seen)
+
+
+def test_fused():
+    fns = ['./tests/1/api118/benchmark.json',
+           './tests/input/heavy_metadata/benchmark.json']
+
+    for fn in fns:
+        with open(fn, encoding='utf-8') as f:
+            raw = f.read()
+        ref = run(raw)
+        assert run(raw, fused=True) == ref, fn
+        assert run(raw, fused=True, streaming=True) == ref, fn
+
+
+def test_fused_contract():
+    seen = []
+
+    def split(elem, doc):
+        if type(elem) == pf.Emph:
+            return list(elem.content)
+        elif type(elem) == pf.Space:
+            return []
+        elif type(elem) == pf.Strong:
+            return pf.SmallCaps(*elem.content)
+
+    def record(elem, doc):
+        seen.append(elem.tag)
+        if type(elem) == pf.Str:
+            return pf.Str(elem.text + '!')
+
+    def count(elem, doc):
+        if type(elem) == pf.Para:
+            seen.append(len(elem.content))
+    count.sequential = True
+
+    para = pf.Para(pf.Emph(pf.Str('a'), pf.Str('b')), pf.Space,
+                   pf.Strong(pf.Str('c')))
+    doc = pf.Doc(para)
+    pf.run_filters([split, record, count], doc=doc, fused=True)
+    # Items of lists go through the remaining actions (but not their
+    # children again), deleted elements don't, replacements do,
+    # and sequential actions see the complete result
+    assert seen == ['MetaMap', 'Str', 'Str', 'Str', 'Str', 'Str',
+                    'SmallCaps', 'Para', 'Doc', 3]
+    assert pf.stringify(doc) == 'a!!b!!c!\n\n'
+
+
+if __name__ == "__main__":
+    test_streaming()
+    test_lazy()
+    test_streaming_doc()
+    test_fused()
+    test_fused_contract()
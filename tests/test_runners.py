@@ -0,0 +1,104 @@
+import os
+import runpy
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import panflute as pf
+from panflute.runners import get_runner, set_runner, server_params
+
+pytestmark = pytest.mark.skipif(os.name == 'nt', reason='shell stand-in')
+
+fake_pandoc = runpy.run_path('./tests/runners/fake_pandoc.py')['install']
+
+
+def pid(out):
+    return out.split()[0]
+
+
+def test_server_params():
+    assert server_params(['--from=markdown', '--to=json', '--standalone',
+                          '--columns=72']) == \
+        {'from': 'markdown', 'to': 'json', 'standalone': True, 'columns': 72}
+    assert server_params(['--from=markdown', '--filter=foo']) is None
+    assert server_params(['--columns=x']) is None
+    assert server_params(['--from', 'markdown']) is None
+
+
+def test_process():
+    with tempfile.TemporaryDirectory() as folder:
+        runner = get_runner('process', pandoc_path=fake_pandoc(folder))
+        out1 = runner.run('a', ['--from=markdown', '--to=html'])
+        out2 = runner.run('b', ['--to=html'])
+        assert out1.endswith('markdown>html:A')
+        assert pid(out1) != pid(out2)
+        with pytest.raises(IOError):
+            runner.run('fail', [])
+
+    with pytest.raises(OSError):
+        get_runner('process', pandoc_path='./missing/pandoc').run('', [])
+
+
+def test_server():
+    with tempfile.TemporaryDirectory() as folder:
+        path = fake_pandoc(folder)
+        with get_runner('server', pandoc_path=path, max_workers=4) as runner:
+            args = ['--from=markdown', '--to=html', '--standalone']
+            outs = [runner.run('x{}'.format(i), args) for i in range(10)]
+            assert outs[3].endswith('markdown>html standalone:X3')
+            assert len(set(pid(out) for out in outs)) == 1
+
+            # Concurrent conversions
+            with ThreadPoolExecutor(8) as pool:
+                texts = ['y{}'.format(i) for i in range(40)]
+                outs = list(pool.map(lambda t: runner.run(t, args), texts))
+            assert [out.split(':')[1] for out in outs] == \
+                [t.upper() for t in texts]
+            assert len(set(pid(out) for out in outs)) == 1
+
+            # Unsupported arguments go to a new process
+            out = runner.run('z', ['--to=html', '--lua-filter=f.lua'])
+            assert out.endswith('None>html:Z')
+            assert pid(out) != pid(outs[0])
+
+            with pytest.raises(IOError):
+                runner.run('fail', args)
+
+            # The server is restarted if it stops
+            runner.close()
+            assert runner.run('w', args).endswith(':W')
+            assert runner.proc.poll() is None
+            proc = runner.proc
+        assert proc.wait(timeout=5) is not None
+
+        # Older Pandocs: one process per conversion
+        os.environ['FAKE_PANDOC_NO_SERVER'] = '1'
+        try:
+            runner = get_runner('server', pandoc_path=path)
+            out1 = runner.run('a', ['--to=html'])
+            out2 = runner.run('b', ['--to=html'])
+            assert not runner.available
+            assert out1.endswith(':A') and pid(out1) != pid(out2)
+        finally:
+            del os.environ['FAKE_PANDOC_NO_SERVER']
+
+
+def test_convert_text():
+    with tempfile.TemporaryDirectory() as folder:
+        set_runner('server', pandoc_path=fake_pandoc(folder))
+        try:
+            out1 = pf.convert_text('*a*', output_format='html')
+            out2 = pf.run_pandoc('b', ['--to=latex'])
+            assert out1.endswith('markdown>html:*A*')
+            assert out2.endswith('None>latex:B')
+            assert pid(out1) == pid(out2)
+        finally:
+            set_runner(None)
+    assert get_runner().name == 'process'
+
+
+if __name__ == "__main__":
+    test_server_params()
+    test_process()
+    test_server()
+    test_convert_text()
@@ -0,0 +1,76 @@
+import io
+import panflute as pf
+
+
+def test_stringify():
+    quoted = pf.Quoted(pf.Emph(pf.Str('a')), pf.Space, pf.Str('b'))
+    para = pf.Para(quoted, pf.Quoted(pf.Str('c')), pf.LineBreak)
+    doc = pf.Doc(pf.Header(pf.Str('Title')), para,
+                 metadata={'title': pf.MetaInlines(pf.Str('t'))})
+
+    # Quotes are added to the text of the first and last children of
+    # Quoted elements, after the text of their own children
+    assert pf.stringify(para) == 'a" b""c" \n\n'
+    assert pf.stringify(para, newlines=False) == 'a" b""c" '
+    assert pf.stringify(quoted.content[2]) == 'b"'
+    assert pf.stringify(doc) == 'tTitlea" b""c" \n\n'
+
+    # Read-only: nothing is rebuilt
+    content = para.content
+    pf.stringify(doc)
+    assert para.content is content and doc.content[1] is para
+
+
+def test_stringify_deep():
+    elem = pf.Str('x')
+    for i in range(5000):
+        elem = pf.Emph(elem)
+    assert pf.stringify(pf.Para(elem)) == 'x\n\n'
+
+
+def test_stringify_cache():
+    header = pf.Header(pf.Str('a'), pf.Space, pf.Emph(pf.Str('b')))
+    quoted = pf.Quoted(pf.Str('q'))
+    doc = pf.Doc(header, pf.Para(quoted))
+
+    for newlines in (True, False):
+        for elem in (doc, header, quoted.content[0]):
+            ans = pf.stringify(elem, newlines=newlines)
+            assert pf.stringify(elem, newlines=newlines, cache=True) == ans
+            assert pf.stringify(elem, newlines=newlines, cache=True) == ans
+    assert pf.stringify(doc, cache=True) == 'a b"q"\n\n'
+    assert pf.stringify(doc, newlines=False, cache=True) == 'a b"q"'
+
+    # Modifications of the element or its descendants discard the text
+    emph = header.content[2]
+    emph.content[0].text = 'c'
+    assert pf.stringify(header, cache=True) == 'a c'
+    assert pf.stringify(doc, cache=True) == 'a c"q"\n\n'
+    emph.content.append(pf.Str('d'))
+    assert pf.stringify(header, cache=True) == 'a cd'
+    header.content = [pf.Str('e')]
+    assert pf.stringify(header, cache=True) == 'e'
+    doc.content.insert(0, pf.Para(pf.Str('f')))
+    assert pf.stringify(doc, cache=True) == 'f\n\ne"q"\n\n'
+
+    # Also when the children are used to build other elements
+    plain = pf.Plain(*header.content)
+    header.content[0].text = 'g'
+    assert pf.stringify(header, cache=True) == 'g'
+    assert pf.stringify(doc, cache=True) == 'f\n\ng"q"\n\n'
+    assert pf.stringify(plain, cache=True) == 'g'
+
+    # The cache does not prevent dumping unmodified blocks as they were
+    with io.StringIO() as f:
+        pf.dump(pf.Doc(pf.Para(pf.Str('x'))), f)
+        raw = f.getvalue()
+    doc = pf.load(io.StringIO(raw), lazy=True)
+    para = doc.content[0]
+    assert pf.stringify(para, cache=True) == 'x\n\n'
+    assert para._cache['json']
+
+
+if __name__ == "__main__":
+    test_stringify()
+    test_stringify_deep()
+    test_stringify_cache()
@@ -0,0 +1,429 @@
+import io
+import copy
+import weakref
+
+import pytest
+import panflute as pf
+from panflute.elements import CHILD_TYPES
+
+
+def make_doc():
+    return pf.Doc(pf.Para(pf.Str('a'), pf.Space, pf.Emph(pf.Str('b'))),
+                  pf.BulletList(pf.ListItem(pf.Plain(pf.Str('c'))),
+                                pf.ListItem(pf.Plain(pf.Str('d')))),
+                  pf.Header(pf.Str('e'), level=2),
+                  metadata={'title': pf.MetaInlines(pf.Str('f')),
+                            'drop': pf.MetaString('g')})
+
+
+def test_order():
+    visited = []
+
+    def action(elem, doc):
+        visited.append(elem.tag)
+
+    make_doc().walk(action)
+    assert visited == ['Str', 'MetaInlines', 'MetaString', 'MetaMap',
+                       'Str', 'Space', 'Str', 'Emph', 'Para',
+                       'Str', 'Plain', 'ListItem',
+                       'Str', 'Plain', 'ListItem', 'BulletList',
+                       'Str', 'Header', 'Doc']
+
+
+def test_replace_delete_splice():
+    def action(elem, doc):
+        if isinstance(elem, pf.Space):
+            return []
+        elif isinstance(elem, pf.Emph):
+            return [pf.Str('x'), pf.Str('y')]
+        elif isinstance(elem, pf.Header):
+            return pf.Para(*elem.content)
+        elif isinstance(elem, pf.MetaString):
+            return []
+        elif isinstance(elem, pf.Doc):
+            assert doc is elem
+
+    doc = make_doc().walk(action)
+    assert repr(doc.content[0]) == 'Para(Str(a) Str(x) Str(y))'
+    assert repr(doc.content[2]) == 'Para(Str(e))'
+    assert list(doc.metadata.content.keys()) == ['title']
+    assert doc.content[0].content[1].parent is doc.content[0]
+
+
+def test_splice():
+    words = [pf.Str(str(i)) for i in range(100)]
+    doc = pf.Doc(pf.Para(*words), pf.Para(pf.Str('a'), pf.Space, pf.Str('b')))
+    para, small = doc.content
+    content = para.content
+
+    # Nothing changed: the containers are kept as they are
+    doc.walk(lambda elem, doc: None)
+    assert para.content is content
+    assert para.content.list == words
+
+    # A few changes are spliced in place
+    def action(elem, doc):
+        if isinstance(elem, pf.Space):
+            return [pf.Str('-'), pf.Str('-')]
+        elif isinstance(elem, pf.Str) and elem.text == 'a':
+            return []
+
+    doc.walk(action)
+    assert pf.stringify(small) == '--b\n\n'
+
+    # Many changes: every other item is deleted
+    def action(elem, doc):
+        if isinstance(elem, pf.Str) and elem.text.isdigit() \
+                and int(elem.text) % 2:
+            return []
+
+    doc.walk(action)
+    assert para.content is content
+    assert para.content.list == words[::2]
+
+    # Replacements are still type checked
+    def action(elem, doc):
+        if isinstance(elem, pf.Str) and elem.text == 'b':
+            return pf.Para()
+
+    with pytest.raises(TypeError):
+        doc.walk(action)
+
+    # Items added by the actions themselves are also walked
+    def action(elem, doc):
+        if isinstance(elem, pf.Str) and elem.text == '0':
+            elem.parent.content.insert(elem.index + 1, pf.Str('x'))
+        elif isinstance(elem, pf.Str) and elem.text == 'x':
+            return pf.Str('y')
+
+    doc.walk(action)
+    assert pf.stringify(para).startswith('0y2')
+
+
+def test_dispatch():
+    fn = './tests/1/api118/benchmark.json'
+    with open(fn, encoding='utf-8') as f:
+        raw = f.read()
+
+    calls = []
+
+    def upper_header(elem, doc):
+        calls.append(elem)
+        return pf.Para(*elem.content)
+
+    def drop_code(elem, doc):
+        calls.append(elem)
+        return []
+
+    def action(elem, doc):
+        if isinstance(elem, pf.Header):
+            return upper_header(elem, doc)
+        elif isinstance(elem, (pf.CodeBlock, pf.Code)):
+            return drop_code(elem, doc)
+
+    ref = pf.load(io.StringIO(raw)).walk(action)
+    expected = len(calls)
+    assert expected
+    del calls[:]
+
+    actions = {pf.Header: upper_header, pf.CodeBlock: drop_code,
+               pf.Code: drop_code}
+    for lazy in (False, True):
+        doc = pf.load(io.StringIO(raw), lazy=lazy).walk(actions)
+        assert len(calls) == expected
+        assert pf.stringify(doc) == pf.stringify(ref)
+        del calls[:]
+
+    # Base classes get all their subclasses
+    visited = set()
+    make_doc().walk({pf.Inline: lambda elem, doc: visited.add(elem.tag)})
+    assert visited == {'Str', 'Space', 'Emph'}
+
+    # Plans are reused, but not the actions
+    class Action(object):
+        def __call__(self, elem, doc):
+            visited.add(elem.tag)
+    action = Action()
+    ref = weakref.ref(action)
+    make_doc().walk({pf.Header: action})
+    del action
+    assert ref() is None and 'Header' in visited
+
+
+def test_dispatch_skip():
+    doc = make_doc()
+    with io.StringIO() as f:
+        pf.dump(doc, f)
+        raw = f.getvalue()
+
+    # Blocks without targets are not decoded
+    doc = pf.load(io.StringIO(raw), lazy=True)
+    doc.walk({pf.ListItem: lambda elem, doc: None})
+    decoded = [type(x) is not pf.containers.RawJSON for x in doc.content.list]
+    assert decoded == [False, True, False]
+
+    # Metadata targets don't need the blocks
+    visited = []
+    doc = pf.load(io.StringIO(raw), lazy=True)
+    doc.walk({pf.MetaString: lambda elem, doc: visited.append(elem.text)})
+    assert visited == ['g']
+    assert all(type(x) is pf.containers.RawJSON for x in doc.content.list)
+
+
+def test_child_types():
+    fns = ['./tests/1/api118/benchmark.json',
+           './tests/input/awesome-c/benchmark.json',
+           './tests/input/heavy_metadata/benchmark.json']
+
+    def action(elem, doc):
+        for child in elem._children:
+            obj = getattr(elem, child)
+            if obj is None:
+                continue
+            oktypes = obj.oktypes if hasattr(obj, 'oktypes') else type(obj)
+            if not isinstance(oktypes, tuple):
+                oktypes = (oktypes,)
+            assert set(oktypes) <= set(CHILD_TYPES[type(elem)])
+
+    for fn in fns:
+        with open(fn, encoding='utf-8') as f:
+            pf.load(f).walk(action)
+
+
+def test_deep_nesting():
+    depth = 5000
+    elem = pf.Para(pf.Str('a'))
+    for i in range(depth):
+        elem = pf.BlockQuote(elem)
+    doc = pf.Doc(elem)
+
+    count = []
+
+    def action(elem, doc):
+        if isinstance(elem, pf.BlockQuote):
+            count.append(elem)
+        elif isinstance(elem, pf.Str):
+            return pf.Str('b')
+
+    doc.walk(action)
+    assert len(count) == depth
+    assert count[-1] is doc.content[0]
+    assert pf.stringify(count[0]) == 'b\n\n'
+
+
+def test_topdown():
+    visited = []
+
+    def action(elem, doc):
+        visited.append(elem.tag)
+        if isinstance(elem, pf.BulletList):
+            return pf.SKIP_CHILDREN
+        elif isinstance(elem, pf.Emph):
+            return [pf.Strong(pf.Str('x')), pf.Str('y')]
+        elif isinstance(elem, pf.Header):
+            return pf.Para(*elem.content)
+
+    doc = make_doc().walk(action, topdown=True)
+    # Replacements are not visited, but their children are
+    assert visited == ['Doc', 'MetaMap', 'MetaInlines', 'Str', 'MetaString',
+                       'Para', 'Str', 'Space', 'Emph', 'Str',
+                       'BulletList', 'Header', 'Str']
+    assert repr(doc.content[0]) == \
+        'Para(Str(a) Space Strong(Str(x)) Str(y))'
+    assert repr(doc.content[2]) == 'Para(Str(e))'
+
+    # Same thing with a dict of actions
+    del visited[:]
+    doc = make_doc().walk({pf.Block: action}, topdown=True)
+    assert visited == ['Para', 'BulletList', 'Header']
+    assert repr(doc.content[2]) == 'Para(Str(e))'
+
+
+def test_stop():
+    for topdown in (False, True):
+        visited = []
+
+        def action(elem, doc):
+            visited.append(elem.tag)
+            if isinstance(elem, pf.Str) and elem.text == 'c':
+                return pf.STOP_WALK
+            elif isinstance(elem, pf.Space):
+                return []
+
+        doc = make_doc()
+        assert doc.walk(action, topdown=topdown) is doc
+        # Changes made before stopping are kept
+        assert visited[-1] == 'Str' and 'Header' not in visited
+        assert visited.count('Str') == 4  # f, a, b, c
+        assert repr(doc.content[0]) == 'Para(Str(a) Emph(Str(b)))'
+        assert doc.content[0].content[1].parent is doc.content[0]
+        assert repr(doc.content[1]) == repr(make_doc().content[1])
+
+    # Stopping inside a lazily loaded document
+    with io.StringIO() as f:
+        pf.dump(make_doc(), f)
+        raw = f.getvalue()
+    doc = pf.load(io.StringIO(raw), lazy=True)
+    doc.walk(lambda elem, doc: pf.STOP_WALK, topdown=True)
+    assert all(type(x) is pf.containers.RawJSON for x in doc.content.list)
+
+
+def test_iter():
+    doc = make_doc()
+    walked = []
+    doc.walk(lambda elem, doc: walked.append(elem), topdown=True)
+    assert list(doc.iter()) == walked
+    assert [e.text for e in doc.iter(pf.Str)] == ['f', 'a', 'b', 'c', 'd', 'e']
+    assert [e.tag for e in doc.iter((pf.Emph, pf.ListItem))] == \
+        ['Emph', 'ListItem', 'ListItem']
+    assert list(doc.content[0].iter(pf.Block)) == [doc.content[0]]
+
+    # Blocks without the requested types are not decoded
+    with io.StringIO() as f:
+        pf.dump(doc, f)
+        raw = f.getvalue()
+    doc = pf.load(io.StringIO(raw), lazy=True)
+    assert [e.level for e in doc.iter(pf.Header)] == [2]
+    decoded = [type(x) is not pf.containers.RawJSON for x in doc.content.list]
+    assert decoded == [False, False, True]
+
+
+def test_parents():
+    def check(elem):
+        for child in elem._children:
+            obj = getattr(elem, child)
+            items = obj.values() if isinstance(obj, pf.DictContainer) else \
+                [obj] if isinstance(obj, pf.Element) else obj or []
+            for item in items:
+                assert item.parent is elem
+                check(item)
+
+    # Parents are set when elements enter containers, not when read
+    doc = make_doc()
+    check(doc)
+    para = doc.content[0]
+    para.content.insert(1, pf.Strong(pf.Str('s')))
+    para.content[0] = pf.Str('z')
+    doc.content.append(pf.Table(pf.TableRow(pf.TableCell()),
+                                caption=[pf.Str('c')],
+                                header=pf.TableRow(pf.TableCell())))
+    doc.metadata['new'] = pf.MetaList(pf.MetaBool(True))
+    check(doc)
+    assert doc.content[-1].caption[0].location == 'caption'
+    assert doc.metadata.location == 'metadata'
+
+    for lazy in (False, True):
+        with open('./tests/1/api118/benchmark.json', encoding='utf-8') as f:
+            loaded = pf.load(f, lazy=lazy)
+        check(loaded)
+
+    # Elements also added somewhere else get their parent back in walks
+    header = doc.content[2]
+    doc.content.append(pf.Plain(*header.content))
+    assert header.content[0].parent is not header
+    parents = []
+    doc.walk(lambda elem, doc: parents.append((elem, elem.parent)))
+    assert (header.content[0], header) in parents
+
+
+def test_shared():
+    with io.StringIO() as f:
+        pf.dump(pf.Doc(pf.Header(pf.Str('Old'))), f)
+        raw = f.getvalue()
+    doc = pf.load(io.StringIO(raw), lazy=True)
+    h = doc.content[0]
+    assert pf.stringify(h, cache=True) == 'Old'
+
+    # Elements are moved, and the caches of their old parent discarded
+    plain = pf.Plain(*h.content)
+    h.content[0].text = 'New'
+    assert h.content[0].parent is plain
+    assert pf.stringify(h, cache=True) == 'New'
+    assert pf.stringify(plain) == 'New'
+    with io.StringIO() as f:
+        pf.dump(doc, f)
+        assert '"New"' in f.getvalue() and '"Old"' not in f.getvalue()
+
+    # References kept by the actions follow the elements they wrap
+    headers = []
+
+    def wrap(elem, doc):
+        if isinstance(elem, pf.Header):
+            headers.append(elem)
+            return pf.Div(elem)
+
+    def finalize(doc):
+        for i, header in enumerate(headers):
+            header.content.insert(0, pf.Str('{}.'.format(i + 1)))
+
+    doc = pf.Doc(pf.Header(pf.Str('Intro')), pf.Plain(pf.Str('x')),
+                 pf.Header(pf.Str('End')))
+    pf.run_filter(wrap, finalize=finalize, doc=doc)
+    assert pf.stringify(doc) == '1.Introx2.End'
+    assert doc.content[0].content[0] is headers[0]
+
+    # Copies of whole subtrees
+    table = pf.Table(pf.TableRow(pf.TableCell(pf.Plain(pf.Str('x')))),
+                     header=pf.TableRow(pf.TableCell()), caption=[pf.Str('c')])
+    doc.content.append(table)
+    copied = copy.deepcopy(table)
+    assert copied.parent is None and repr(copied) == repr(table)
+    assert copied.header.parent is copied
+    assert copied.content[0].content[0].content[0].parent is \
+        copied.content[0].content[0]
+    copied.alignment[0] = 'AlignLeft'
+    assert table.alignment[0] == 'AlignDefault'
+
+
+def test_doc():
+    doc = make_doc()
+    other = make_doc()
+    emph = doc.content[0].content[2]
+    inner = emph.content[0]
+    assert inner.doc is doc and emph.doc is doc
+    assert all(elem.doc is doc for elem in doc.iter())
+
+    # Moves elsewhere keep the cached roots
+    other.content.append(pf.Para(pf.Str('z')))
+    assert inner._root == (doc,) and emph._root == (doc,)
+
+    # Subtrees moved to another document
+    para = doc.content.pop(0)
+    block = doc.content.pop(0)
+    other.content.append(block)
+    assert block.content[0].content[0].doc is other
+    para.content.remove(emph)
+    other.metadata['emph'] = pf.MetaInlines(emph)
+    assert inner.doc is other
+
+    # Detached subtrees and new parents
+    inner.parent = None
+    assert inner.doc is None
+    header = pf.Header(pf.Str('x'))
+    assert header.content[0].doc is None
+    doc.content.append(header)
+    assert header.content[0].doc is doc
+
+    def action(elem, doc):
+        assert elem.doc is doc
+        if isinstance(elem, pf.Header):
+            return pf.Div(pf.Para(*elem.content))
+
+    doc.walk(action)
+    assert header.content[0].doc is doc
+
+
+if __name__ == "__main__":
+    test_order()
+    test_replace_delete_splice()
+    test_splice()
+    test_dispatch()
+    test_dispatch_skip()
+    test_child_types()
+    test_deep_nesting()
+    test_topdown()
+    test_stop()
+    test_iter()
+    test_parents()
+    test_shared()
+    test_doc()